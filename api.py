@@ -1,57 +1,155 @@
+import time
+_STARTED = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import pandas as pd
 import numpy as np
-import pickle
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore, db as realtime_db
-import firebase_client
-import firestore_client
-from model_utils import load_model_and_encoders
+import atexit
+import threading
+from model_utils import load_encoders, load_model
+from prediction_table import PredictionTable, free_classes
+from slot_registry import SlotRegistry
+from prediction_cache import PredictionCache
+from parking_mirror import ParkingMirror
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize Firebase App once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH"))
-    firebase_admin.initialize_app(cred, {
-        "databaseURL": os.getenv("FIREBASE_DATABASE_URL")
-    })
+app = Flask(__name__)
 
-db = firestore.client()
+# Filled by load_models() (once, before the server forks) and start_services() (in every worker)
+model, le, slot_le = None, None, None
+PREDICTION_TABLE = None         # every prediction the model can make, by (hour, day, weekday, slot)
+PARKING_CONFIG = {}
+SLOT_REGISTRY = None            # local slot ids -> encoded model slot ids, per area
+PREDICTION_CACHE = None         # local tier in front of the Firestore 'predictions' collection
+PARKING_MIRROR = None           # copy of the realtime parking/ tree
+STARTUP = {}                    # seconds per startup stage, reported by /ready
+STREAM_SLOTS = None             # caps open /parking/stream connections in this process
 
-app = Flask(__name__)
+def init_firebase():
+    # imported here: firebase_admin (and grpc behind it) is only needed once services start
+    import firebase_admin
+    from firebase_admin import credentials
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH"))
+        firebase_admin.initialize_app(cred, {
+            "databaseURL": os.getenv("FIREBASE_DATABASE_URL")
+        })
+
+def load_models():
+    """
+    Loads everything read-only: encoders, prediction table, config. Under
+    gunicorn this runs in the master before it forks, so the workers share
+    these pages instead of each unpickling its own copy. The model itself
+    is only unpickled when there is no saved prediction table for it.
+    """
+    global model, le, slot_le, PREDICTION_TABLE, PARKING_CONFIG, SLOT_REGISTRY
+    STARTUP["imports"] = round(time.perf_counter() - _STARTED, 3)
+
+    start = time.perf_counter()
+    print("Loading model and encoders...")
+    le, slot_le = load_encoders()
+    if slot_le is not None:
+        try:
+            PREDICTION_TABLE = PredictionTable.load(le, slot_le)
+        except Exception as e:
+            print(f"Prediction table unavailable: {e}")
+        if PREDICTION_TABLE is None:
+            model = load_model()
+            if model:
+                try:
+                    PREDICTION_TABLE = PredictionTable.load_or_build(model, le, slot_le)
+                except Exception as e:
+                    print(f"Prediction table unavailable, predicting per request: {e}")
+    if PREDICTION_TABLE is not None or model:
+        print("Model loaded successfully.")
+    else:
+        print("Model not found! Run model_utils.py first.")
+    STARTUP["model"] = round(time.perf_counter() - start, 3)
+
+    # Load config
+    try:
+        with open("parking_config.json", "r") as f:
+            PARKING_CONFIG = json.load(f)
+    except Exception as e:
+        print(f"Error loading parking_config.json: {e}")
+        PARKING_CONFIG = {}
+    SLOT_REGISTRY = SlotRegistry(PARKING_CONFIG, slot_le.classes_) if slot_le else None
+
+def start_services():
+    """
+    Connects to Firebase and starts the background threads. Threads and
+    network clients do not survive a fork, so under gunicorn every worker
+    calls this itself (post_fork in gunicorn.conf.py).
+    """
+    global PREDICTION_CACHE, PARKING_MIRROR, STREAM_SLOTS
+    start = time.perf_counter()
+    init_firebase()
+
+    # Writes go out to Firestore in batches, from a background thread
+    PREDICTION_CACHE = PredictionCache()
+    PREDICTION_CACHE.start()
+    atexit.register(PREDICTION_CACHE.stop)
+
+    # Kept current by a listener (PARKING_MIRROR=poll re-reads an area at most
+    # every PARKING_MIRROR_TTL seconds instead)
+    PARKING_MIRROR = ParkingMirror(mode=os.getenv("PARKING_MIRROR", "listen"),
+                                   ttl=float(os.getenv("PARKING_MIRROR_TTL", "2.0"))).start()
+    atexit.register(PARKING_MIRROR.stop)
+
+    # Each open stream holds a server thread; the cap keeps some for the other endpoints
+    STREAM_SLOTS = threading.BoundedSemaphore(int(os.getenv("PARKING_STREAM_LIMIT", "64")))
+    STARTUP["services"] = round(time.perf_counter() - start, 3)
 
-# Load model and encoders
-print("Loading model and encoders...")
-model, le, slot_le = load_model_and_encoders()
-if model:
-    print("Model loaded successfully.")
-else:
-    print("Model not found! Run model_utils.py first.")
-
-# Load config
-try:
-    with open("parking_config.json", "r") as f:
-        PARKING_CONFIG = json.load(f)
-except Exception as e:
-    print(f"Error loading parking_config.json: {e}")
-    PARKING_CONFIG = {}
+def stop_services():
+    if PREDICTION_CACHE is not None:
+        PREDICTION_CACHE.stop()
+    if PARKING_MIRROR is not None:
+        PARKING_MIRROR.stop()
+
+def create_app(services=True):
+    """
+    The app factory. `gunicorn -c gunicorn.conf.py` calls it with
+    services=False in the master and starts the services per worker;
+    `python api.py` does both here.
+    """
+    if "model" not in STARTUP:
+        load_models()
+    if services and PARKING_MIRROR is None:
+        start_services()
+    STARTUP["total"] = round(time.perf_counter() - _STARTED, 3)
+    print(f"API loaded in {STARTUP['total']}s: {STARTUP}")
+    return app
 
 @app.route("/", methods=["GET"])
 def index():
     return jsonify({
         "status": "running", 
-        "endpoints": ["/predict", "/areas", "/parking", "/health"]
+        "endpoints": ["/predict", "/predict/batch", "/areas", "/parking", "/parking/stream", "/health", "/ready"]
     })
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok", "service": "parking-api"}), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """200 once this worker can answer from memory: predictor loaded, services started, mirror filled."""
+    mirror_ready = PARKING_MIRROR is not None and PARKING_MIRROR.ready
+    ready = "model" in STARTUP and PREDICTION_CACHE is not None and mirror_ready
+    return jsonify({
+        "ready": ready,
+        "pid": os.getpid(),
+        "prediction_table": PREDICTION_TABLE is not None,
+        "model": model is not None,
+        "parking_mirror": PARKING_MIRROR.mode if PARKING_MIRROR is not None else None,
+        "startup_seconds": STARTUP,
+        "uptime_seconds": round(time.perf_counter() - _STARTED, 3),
+    }), 200 if ready else 503
+
 @app.route("/areas", methods=["GET"])
 def get_areas():
     # Helper to return static config (coordinates etc)
@@ -62,30 +160,53 @@ def get_areas():
 @app.route('/parking', methods=['GET'])
 def get_parking_status():
     area_name = request.args.get('area')
-    print(f"DEBUG: Fetching real-time status for area: {area_name}")
     try:
-        data = firebase_client.get_parking_data(area_name)
-        
-        if data is None:
-            print(f"DEBUG: Area '{area_name}' not found in Firebase.")
+        # Served from the in-memory mirror: no database read per poll
+        entry = PARKING_MIRROR.get(area_name)
+        if entry is None:
             return jsonify({"error": f"Area '{area_name}' not found"}), 404
 
-        # FIX: Firebase sometimes converts maps with numeric keys ("1", "2") into lists.
-        # Flutter expects a Map, so we convert it back if necessary.
-        if data and 'slots' in data and isinstance(data['slots'], list):
-            slots_list = data['slots']
-            slots_dict = {}
-            for i, slot_val in enumerate(slots_list):
-                if slot_val is not None:
-                    slots_dict[str(i)] = slot_val
-            data['slots'] = slots_dict
-
-        print(f"DEBUG: Data sent to App: {data}")
-        return jsonify(data), 200
+        # Unchanged since the client's copy: 304 without a body
+        etag, body = entry
+        response = app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
     except Exception as e:
-        print(f"DEBUG: Error fetching real-time status: {e}")
+        print(f"Error fetching real-time status: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/parking/stream', methods=['GET'])
+def stream_parking_status():
+    """
+    Server-Sent Events for one area (?area=area1) or all of them: a
+    "snapshot" event with the full state, then a "delta" event with the
+    changed paths (e.g. {"slots/3/status": "free"}) whenever occupancy
+    changes, and a heartbeat comment otherwise.
+
+    At most PARKING_STREAM_LIMIT streams are open per process; beyond that
+    the answer is 503 with Retry-After.
+    """
+    area_name = request.args.get('area')
+    heartbeat = float(os.getenv("PARKING_STREAM_HEARTBEAT", "15"))
+
+    if not STREAM_SLOTS.acquire(blocking=False):
+        response = jsonify({"error": "Too many open streams, retry later or poll /parking"})
+        response.headers["Retry-After"] = "10"
+        return response, 503
+    try:
+        response = app.response_class(
+            PARKING_MIRROR.stream(area_name, heartbeat=heartbeat),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # the server closes the response when the client goes away
+        response.call_on_close(STREAM_SLOTS.release)
+    except Exception:
+        STREAM_SLOTS.release()
+        raise
+    return response
+
 @app.route("/predict", methods=["GET", "POST"])
 def predict():
     """
@@ -94,7 +215,7 @@ def predict():
     - area_name: str (e.g., 'area1')
     - timestamp: str (ISO format)
     """
-    if not model or not slot_le:
+    if not slot_le or (PREDICTION_TABLE is None and not model):
         return jsonify({"error": "Model not loaded"}), 500
 
     if request.method == 'POST':
@@ -114,72 +235,48 @@ def predict():
         return jsonify({"error": f"Area {area_name} not found in config"}), 404
         
     slots_dict = area_config.get("slots", {})
-    
+    area_slots = SLOT_REGISTRY.area(area_name)
+    if not area_slots.slot_ids:
+        return jsonify({"free_slots": [], "message": "No known slots for this area in model"})
+
+    if PREDICTION_TABLE is not None:
+        try:
+            dt = datetime.fromisoformat(timestamp_str)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        free = PREDICTION_TABLE.free_mask(dt, area_slots.encoded)
+        return jsonify({
+            "free_slots": [s for s, f in zip(area_slots.slot_ids, free) if f],
+            "total_checked": len(area_slots.slot_ids),
+            "input_time": timestamp_str,
+            "source": "table"
+        })
+
     try:
-        # 1. Check Firestore Cache First
-        cached_result = firestore_client.get_prediction_from_firestore(area_name, timestamp_str)
-        if cached_result:
-            print(f"Returning cached prediction from Firestore for {area_name} at {timestamp_str}")
+        # 1. Check the local prediction cache first (no Firestore read on a miss)
+        cached_slots = PREDICTION_CACHE.get(area_name, timestamp_str)
+        if cached_slots is not None:
             return jsonify({
-                "free_slots": cached_result.get("free_slots", []),
+                "free_slots": cached_slots,
                 "total_checked": len(slots_dict), # Appoximation from config
                 "input_time": timestamp_str,
                 "source": "cache"
             })
 
         dt = datetime.fromisoformat(timestamp_str)
-        hour = dt.hour
-        day = dt.day
-        weekday = dt.weekday()
 
-        # Prepare batch input: one row per slot
-        input_rows = []
-        valid_slots = []
+        # Predict batch: one row per known slot
+        input_df, _ = SLOT_REGISTRY.features([area_name], [dt])
+        predictions = np.asarray(model.predict(input_df))
+        free = free_classes(le.classes_)[predictions]
+        free_slots = [s for s, f in zip(area_slots.slot_ids, free) if f]
         
-        for slot_id_str in slots_dict.keys():
-            try:
-                 # Map local ID ("1", "2") to model ID ("1", "24")
-                 # Area 1: 1 -> "1", Area 2: 1 -> "24"
-                 model_slot_id = slot_id_str
-                 if area_name == "area2":
-                     model_slot_id = str(int(slot_id_str) + 23)
-
-                 encoded_slot = slot_le.transform([model_slot_id])[0]
-                 input_rows.append({
-                     "hour": hour,
-                     "day": day,
-                     "weekday": weekday,
-                     "slot_id_encoded": encoded_slot
-                 })
-                 valid_slots.append(slot_id_str)
-            except ValueError:
-                # Slot ID not known to model
-                continue
-        
-        if not input_rows:
-             return jsonify({"free_slots": [], "message": "No known slots for this area in model"})
-             
-        input_df = pd.DataFrame(input_rows)
-        
-        # Predict batch
-        predictions = model.predict(input_df)
-        predicted_labels = le.inverse_transform(predictions)
-        
-        free_slots = []
-        for slot_id, label in zip(valid_slots, predicted_labels):
-            # Check if label implies free (Assuming 'Unoccupied' or similar)
-            if str(label).lower() in ["unoccupied", "free", "0"]:
-                free_slots.append(slot_id)
-        
-        # 2. Save Prediction to Firestore for future use
-        try:
-            firestore_client.save_prediction_to_firestore(area_name, timestamp_str, free_slots)
-        except Exception as fe:
-            print(f"Warning: Failed to save to Firestore: {fe}")
+        # 2. Cache the prediction; it reaches Firestore with the next batch
+        PREDICTION_CACHE.put(area_name, timestamp_str, free_slots)
 
         return jsonify({
             "free_slots": free_slots,
-            "total_checked": len(valid_slots),
+            "total_checked": len(area_slots.slot_ids),
             "input_time": timestamp_str,
             "source": "model"
         })
@@ -187,5 +284,89 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+MAX_BATCH_STEPS = 2016     # a week at 5-minute steps
+
+@app.route("/predict/batch", methods=["GET", "POST"])
+def predict_batch():
+    """
+    Free-slot predictions for several areas over a time range, in one call.
+    Query Params (GET) or Body (POST):
+    - areas: list of area names, or comma-separated (default: all areas)
+    - start: str (ISO format, default: now)
+    - end: str (ISO format, default: start + hours)
+    - hours: float (default 12, used when end is missing)
+    - step_minutes: float (default 30)
+
+    Columnar response: "times" once, then per area its "slot_ids" and
+    "free" as one row of 0/1 per time, plus "free_count" per time.
+    """
+    if not slot_le or (PREDICTION_TABLE is None and not model):
+        return jsonify({"error": "Model not loaded"}), 500
+
+    params = (request.json or {}) if request.method == 'POST' else request.args
+    areas = params.get("areas") or list(SLOT_REGISTRY.areas)
+    if isinstance(areas, str):
+        areas = [a.strip() for a in areas.split(",") if a.strip()]
+    if not isinstance(areas, list) or not all(isinstance(a, str) for a in areas):
+        return jsonify({"error": "areas must be a list of area names or a comma-separated string"}), 400
+    missing = [a for a in areas if a not in SLOT_REGISTRY]
+    if missing:
+        return jsonify({"error": f"Areas not found in config: {missing}"}), 404
+
+    try:
+        end = datetime.fromisoformat(params["end"]) if params.get("end") else None
+        if params.get("start"):
+            start = datetime.fromisoformat(params["start"])
+        else:
+            start = datetime.now(end.tzinfo if end is not None else None)
+        if end is None:
+            end = start + timedelta(hours=float(params.get("hours", 12)))
+        step = timedelta(minutes=float(params.get("step_minutes", 30)))
+        if (start.tzinfo is None) != (end.tzinfo is None):
+            raise ValueError("start and end must both have a UTC offset, or neither")
+        if step <= timedelta(0) or end < start:
+            raise ValueError("need step_minutes > 0 and end >= start")
+        steps = int((end - start) / step) + 1
+    except (ValueError, TypeError, OverflowError) as e:
+        # OverflowError: hours / step_minutes like "inf" or "1e9" do not fit a timedelta
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+    if steps > MAX_BATCH_STEPS:
+        return jsonify({"error": f"Too many time steps ({steps}), at most {MAX_BATCH_STEPS}"}), 400
+    times = [start + i * step for i in range(steps)]
+
+    try:
+        if PREDICTION_TABLE is not None:
+            source = "table"
+            encoded = np.concatenate([SLOT_REGISTRY.area(a).encoded for a in areas])
+            free = PREDICTION_TABLE.free_matrix(times, encoded)
+            counts = [len(SLOT_REGISTRY.area(a).encoded) for a in areas]
+        else:
+            # one feature matrix for every slot and time, one model call
+            source = "model"
+            input_df, counts = SLOT_REGISTRY.features(areas, times)
+            predictions = np.asarray(model.predict(input_df))
+            free = free_classes(le.classes_)[predictions].reshape(len(times), sum(counts))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    result = {}
+    column = 0
+    for area_name, count in zip(areas, counts):
+        area_free = free[:, column:column + count]
+        column += count
+        result[area_name] = {
+            "slot_ids": SLOT_REGISTRY.area(area_name).slot_ids,
+            "free": area_free.astype(np.uint8).tolist(),
+            "free_count": area_free.sum(axis=1).tolist(),
+        }
+
+    return jsonify({
+        "times": [t.isoformat() for t in times],
+        "areas": result,
+        "source": source
+    })
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # development server; production: gunicorn -c gunicorn.conf.py
+    create_app().run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")),
+                     debug=os.getenv("FLASK_DEBUG") == "1")
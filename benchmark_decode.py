@@ -0,0 +1,104 @@
+# benchmark_decode.py
+# Times the capture paths on a sample file, each producing every `stride`-th
+# frame at the working resolution, and prints JSON:
+#
+#   opencv_read     cv2 read() every frame + cv2.resize (the original loop)
+#   opencv_grab     cv2 grab() every frame, retrieve() + resize the kept ones (FrameGrabber)
+#   pyav            PyAV threaded decode, BGR conversion + scaling in one pass
+#   pyav_nonref     as pyav, non-reference frames dropped by the decoder
+#
+#   python benchmark_decode.py --video 11.mp4 --frames 600
+import argparse
+import json
+import time
+
+import cv2
+
+from slot_geometry import FRAME_SIZE
+from video_source import PyAvCapture
+
+
+def opencv_read(video, frames, stride):
+    cap = cv2.VideoCapture(video)
+    kept = 0
+    for index in range(frames):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index % stride == 0:
+            cv2.resize(frame, FRAME_SIZE)
+            kept += 1
+    cap.release()
+    return kept
+
+
+def opencv_grab(video, frames, stride):
+    cap = cv2.VideoCapture(video)
+    kept = 0
+    for index in range(frames):
+        if not cap.grab():
+            break
+        if index % stride == 0:
+            ok, frame = cap.retrieve()
+            cv2.resize(frame, FRAME_SIZE)
+            kept += 1
+    cap.release()
+    return kept
+
+
+def pyav(video, frames, stride, skip_nonref=False):
+    cap = PyAvCapture(video, size=FRAME_SIZE, skip_nonref=skip_nonref)
+    kept = 0
+    next_index = 0
+    while cap.grab() and cap.frame_index < frames:
+        # same selection as FrameGrabber: the first frame at or after each stride step
+        if cap.frame_index >= next_index:
+            cap.retrieve()
+            next_index = cap.frame_index + stride
+            kept += 1
+    cap.release()
+    return kept
+
+
+def measure(fn, *args):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    kept = fn(*args)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return {
+        "frames_out": kept,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),                 # all decoder threads included
+        "wall_ms_per_frame": round(wall * 1000 / max(kept, 1), 2),
+        "cpu_ms_per_frame": round(cpu * 1000 / max(kept, 1), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare OpenCV and PyAV capture paths")
+    parser.add_argument("--video", default="11.mp4")
+    parser.add_argument("--frames", type=int, default=600, help="source frames to go through")
+    parser.add_argument("--stride", type=int, default=3, help="keep every Nth frame")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    probe = cv2.VideoCapture(args.video)
+    report = {
+        "video": args.video,
+        "source_size": [int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)), int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))],
+        "working_size": list(FRAME_SIZE),
+        "stride": args.stride,
+        "paths": {},
+    }
+    probe.release()
+
+    paths = report["paths"]
+    paths["opencv_read"] = measure(opencv_read, args.video, args.frames, args.stride)
+    paths["opencv_grab"] = measure(opencv_grab, args.video, args.frames, args.stride)
+    paths["pyav"] = measure(pyav, args.video, args.frames, args.stride)
+    paths["pyav_nonref"] = measure(pyav, args.video, args.frames, args.stride, True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,167 @@
+# benchmark_detector.py
+# Replays a video file (or, without --video, synthetic frames) through
+# ParkingAreaDetector in headless mode and prints per-stage timings as JSON, so throughput can be
+# compared across commits. A stub model is used unless --model is given, so
+# it runs on any CPU box without weights or Firebase credentials.
+#
+#   python benchmark_detector.py --video 11.mp4 --polygons polygons1.json --frames 300
+#   python benchmark_detector.py --frames 500 --draw --out bench.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+from detections import Detections
+from detector import ParkingAreaDetector
+from publisher import ParkingPublisher, InMemoryBackend
+from slot_geometry import FRAME_SIZE
+from stage_timer import StageTimer
+
+
+class StubInference:
+    """
+    Stands in for the model: returns `boxes` random vehicle-sized boxes per
+    call, optionally after sleeping `latency` seconds to emulate a backend.
+    """
+
+    def __init__(self, boxes=20, latency=0.0, seed=0):
+        self.boxes = boxes
+        self.latency = latency
+        self.rng = np.random.default_rng(seed)
+
+    def infer(self, frame):
+        if self.latency:
+            time.sleep(self.latency)
+        height, width = frame.shape[:2]
+        size = np.array([width, height]) * 0.06
+        top_left = self.rng.random((self.boxes, 2)) * (np.array([width, height]) - size)
+        xyxy = np.hstack([top_left, top_left + size]).astype(np.float32)
+        return Detections(xyxy, np.full(self.boxes, 0.9, np.float32),
+                          np.zeros(self.boxes, int), np.arange(self.boxes))
+
+
+class SyntheticSource:
+    """Same start/read/stop/get interface as FrameGrabber, serving noise frames."""
+
+    def __init__(self, size=(1920, 1080), variants=8, seed=0):
+        rng = np.random.default_rng(seed)
+        width, height = size
+        self.frames = [rng.integers(0, 255, (height, width, 3), np.uint8) for _ in range(variants)]
+        self.count = 0
+
+    def start(self):
+        pass
+
+    def read(self, timeout=None):
+        frame = self.frames[self.count % len(self.frames)]
+        self.count += 1
+        return frame.copy()
+
+    def get(self, prop):
+        return 0
+
+    def stop(self):
+        pass
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args):
+    timer = StageTimer()
+    grabber = None
+    if args.synthetic:
+        width, height = (int(v) for v in args.size.split("x"))
+        grabber = SyntheticSource(size=(width, height))
+
+    inference = None if args.model else StubInference(boxes=args.boxes, latency=args.latency_ms / 1000)
+    publisher = ParkingPublisher("bench", backend=InMemoryBackend(), min_interval=0, timer=timer)
+
+    detector = ParkingAreaDetector(
+        area_name="bench",
+        video_source=args.video,
+        polygon_file=args.polygons,
+        model_path=args.model or "best.pt",
+        headless=True,
+        inference=inference,
+        publisher=publisher,
+        motion_gate=args.motion_gate,
+        roi_crop=args.roi_crop,
+        keyframe_interval=args.keyframe,
+        grabber=grabber,
+        timer=timer
+    )
+    detector.draw = args.draw
+
+    # let a real model load its kernels before timing; the stub needs no warm-up
+    if args.model:
+        blank = np.zeros((FRAME_SIZE[1], FRAME_SIZE[0], 3), np.uint8)
+        for _ in range(args.warmup):
+            detector._detect(blank)
+        timer.samples.clear()
+
+    start = time.perf_counter()
+    detector.run(max_frames=args.frames)
+    wall = time.perf_counter() - start
+    frames = len(timer.samples.get("resize", []))
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "config": {
+            "source": f"synthetic {args.size}" if args.synthetic else args.video,
+            "polygons": args.polygons,
+            "slots": detector.geometry.slot_count,
+            "model": args.model or f"stub ({args.boxes} boxes, {args.latency_ms} ms)",
+            "draw": args.draw,
+            "motion_gate": args.motion_gate,
+            "roi_crop": args.roi_crop,
+            "keyframe_interval": args.keyframe,
+        },
+        "frames": frames,
+        "wall_s": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall else None,
+        "publish_writes": publisher.writes,
+        "stages": timer.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the detector pipeline")
+    parser.add_argument("--video", default=None, help="video file to replay (default: synthetic frames)")
+    parser.add_argument("--synthetic", action="store_true", help="use generated frames even with --video")
+    parser.add_argument("--size", default="1920x1080", help="synthetic frame size WxH")
+    parser.add_argument("--polygons", default="polygons1.json")
+    parser.add_argument("--frames", type=int, default=300, help="processed frames to time")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed model calls before the run")
+    parser.add_argument("--model", default=None, help="real model weights instead of the stub")
+    parser.add_argument("--boxes", type=int, default=20, help="stub detections per frame")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub inference latency")
+    parser.add_argument("--draw", action="store_true", help="include overlay drawing")
+    parser.add_argument("--motion-gate", action="store_true")
+    parser.add_argument("--roi-crop", action="store_true")
+    parser.add_argument("--keyframe", type=int, default=None, metavar="N", help="model every N frames, tracking between")
+    parser.add_argument("--out", default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+    if args.video is None:
+        args.synthetic = True
+    elif not args.synthetic and not os.path.isfile(args.video):
+        parser.error(f"video file not found: {args.video}")
+
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
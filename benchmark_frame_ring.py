@@ -0,0 +1,103 @@
+# benchmark_frame_ring.py
+# Hands the same frames from one process to another the two ways the shared
+# inference server can receive them: pickled through a multiprocessing queue,
+# or through a shared-memory FrameRing where only the sequence number crosses.
+# Each frame is a round trip (send, consumer touches it, reply), as with
+# InferenceClient.infer. Prints JSON with latency, CPU time and the bytes
+# copied per frame on each side.
+#
+#   python benchmark_frame_ring.py --frames 500
+#   python benchmark_frame_ring.py --size 1920x1080 --out ring.json
+import argparse
+import json
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+from frame_ring import FrameRing
+from slot_geometry import FRAME_SIZE
+
+
+def consumer(requests, replies, ring):
+    cpu_start = time.process_time()
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        frame = ring.read(item) if ring is not None else item
+        # stand-in for the model reading its input: one pass over the frame
+        value = int(frame[::4, ::4].max())
+        if ring is not None:
+            ring.release(item)
+        del frame
+        replies.put(value)
+    replies.put(time.process_time() - cpu_start)
+    if ring is not None:
+        ring.close()
+
+
+def run(mode, frames, warmup, ctx):
+    ring = FrameRing(slots=4, slot_bytes=frames[0].nbytes) if mode == "ring" else None
+    requests, replies = ctx.Queue(), ctx.Queue()
+    process = ctx.Process(target=consumer, args=(requests, replies, ring))
+    process.start()
+
+    latencies = []
+    cpu_start = time.process_time()
+    for index in range(warmup + len(frames)):
+        frame = frames[index % len(frames)]
+        start = time.perf_counter()
+        requests.put(ring.write(frame) if ring is not None else frame)
+        replies.get()
+        if index >= warmup:
+            latencies.append(time.perf_counter() - start)
+    producer_cpu = time.process_time() - cpu_start
+
+    requests.put(None)
+    consumer_cpu = replies.get()
+    process.join()
+    if ring is not None:
+        ring.close()
+
+    ms = np.array(latencies) * 1000
+    count = warmup + len(frames)
+    frame_bytes = frames[0].nbytes
+    return {
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "frames_per_s": round(1000 / float(ms.mean()), 1),
+        "producer_cpu_ms_per_frame": round(producer_cpu * 1000 / count, 3),
+        "consumer_cpu_ms_per_frame": round(consumer_cpu * 1000 / count, 3),
+        # queue: pickle.dumps, pipe write, pipe read, unpickle;
+        # ring: the one copy into the shared slot
+        "bytes_copied_per_frame": frame_bytes * (4 if mode == "queue" else 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue vs shared-memory frame handoff")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--size", default="x".join(map(str, FRAME_SIZE)), help="frame size WxH")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (height, width, 3), np.uint8) for _ in range(4)]
+    ctx = mp.get_context("spawn")
+
+    report = {"frame_size": [width, height], "frame_bytes": frames[0].nbytes, "frames": args.frames}
+    for mode in ("queue", "ring"):
+        report[mode] = run(mode, frames, args.warmup, ctx)
+    report["latency_speedup"] = round(report["queue"]["mean_ms"] / report["ring"]["mean_ms"], 2)
+    report["bytes_saved_per_frame"] = (report["queue"]["bytes_copied_per_frame"]
+                                       - report["ring"]["bytes_copied_per_frame"])
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
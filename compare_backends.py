@@ -0,0 +1,175 @@
+# compare_backends.py
+# Compares exported / quantized models with the PyTorch reference on the same
+# frames: per-frame latency, box agreement (precision / recall / IoU against
+# the reference boxes) and, what matters for us, slot occupancy agreement.
+#
+#   python compare_backends.py --reference best.pt --candidates best.onnx best_openvino_model/
+#   python compare_backends.py --reference best.pt --export onnx openvino --int8 --data data.yaml
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detections import centers
+from inference_backends import load_backend
+from slot_geometry import SlotGeometry, FRAME_SIZE
+
+
+def sample_frames(video, count, stride):
+    cap = cv2.VideoCapture(video)
+    frames = []
+    index = 0
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % stride == 0:
+            frames.append(cv2.resize(frame, FRAME_SIZE))
+        index += 1
+    cap.release()
+    return frames
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_boxes(reference, candidate, iou_threshold):
+    """Greedy same-class matching, highest IoU first. Returns matched IoUs."""
+    if not len(reference.xyxy) or not len(candidate.xyxy):
+        return []
+    iou = box_iou(reference.xyxy, candidate.xyxy)
+    iou[reference.cls[:, None] != candidate.cls[None, :]] = 0
+    matched = []
+    while True:
+        r, c = np.unravel_index(iou.argmax(), iou.shape)
+        if iou[r, c] < iou_threshold:
+            return matched
+        matched.append(float(iou[r, c]))
+        iou[r, :] = 0
+        iou[:, c] = 0
+
+
+def occupancy(geometry, detections):
+    slots = geometry.lookup(centers(detections))
+    occupied = np.zeros(geometry.slot_count, bool)
+    occupied[slots[slots >= 0]] = True
+    return occupied
+
+
+def run_model(model_path, frames, warmup, threads):
+    load_start = time.perf_counter()
+    model = load_backend(model_path, threads=threads)
+    load_time = time.perf_counter() - load_start
+
+    for frame in frames[:warmup]:
+        model.predict([frame])
+
+    latencies, results = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(model.predict([frame])[0])
+        latencies.append(time.perf_counter() - start)
+    ms = np.array(latencies) * 1000
+    stats = {
+        "backend": type(model).__name__,
+        "load_s": round(load_time, 3),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "fps": round(1000 / float(ms.mean()), 2),
+    }
+    return results, stats
+
+
+def compare(reference, candidate, geometry, iou_threshold):
+    ref_total = sum(len(d.xyxy) for d in reference)
+    cand_total = sum(len(d.xyxy) for d in candidate)
+    ious = []
+    slot_agreement = []
+    for ref, cand in zip(reference, candidate):
+        ious.extend(match_boxes(ref, cand, iou_threshold))
+        slot_agreement.append(np.mean(occupancy(geometry, ref) == occupancy(geometry, cand))
+                              if geometry.slot_count else 1.0)
+    return {
+        "boxes_reference": ref_total,
+        "boxes_candidate": cand_total,
+        "precision": round(len(ious) / cand_total, 4) if cand_total else None,
+        "recall": round(len(ious) / ref_total, 4) if ref_total else None,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "slot_agreement": round(float(np.mean(slot_agreement)), 4),
+    }
+
+
+def export_models(reference, formats, int8, half, data):
+    from ultralytics import YOLO
+    exported = []
+    for fmt in formats:
+        options = {"format": fmt, "int8": int8, "half": half}
+        if data:
+            options["data"] = data     # int8 calibration images
+        exported.append(str(YOLO(reference).export(**options)))
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends with the PyTorch model")
+    parser.add_argument("--reference", default="best.pt")
+    parser.add_argument("--candidates", nargs="*", default=[], help="exported models to compare")
+    parser.add_argument("--export", nargs="*", default=[], choices=["onnx", "openvino"],
+                        help="export the reference to these formats first")
+    parser.add_argument("--int8", action="store_true", help="int8-quantize exports (needs --data)")
+    parser.add_argument("--half", action="store_true", help="fp16 exports")
+    parser.add_argument("--data", default=None, help="dataset yaml for int8 calibration")
+    parser.add_argument("--video", default="11.mp4")
+    parser.add_argument("--polygons", default="polygons1.json")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--stride", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="runtime threads for ONNX/OpenVINO")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a box to count as matched")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    frames = sample_frames(args.video, args.frames, args.stride)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.video}")
+
+    polygons = []
+    if os.path.exists(args.polygons):
+        with open(args.polygons) as f:
+            polygons = json.load(f)
+    geometry = SlotGeometry(polygons)
+
+    candidates = args.candidates + export_models(args.reference, args.export, args.int8, args.half, args.data)
+
+    reference_results, reference_stats = run_model(args.reference, frames, args.warmup, args.threads)
+    report = {
+        "frames": len(frames),
+        "video": args.video,
+        "reference": {"model": args.reference, **reference_stats},
+        "candidates": [],
+    }
+    for path in candidates:
+        results, stats = run_model(path, frames, args.warmup, args.threads)
+        report["candidates"].append({
+            "model": path,
+            **stats,
+            "speedup": round(reference_stats["mean_ms"] / stats["mean_ms"], 2),
+            **compare(reference_results, results, geometry, args.iou),
+        })
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,83 @@
+# detection_cache.py
+# Detections per frame of a video file, kept on disk as one .npz so a looped
+# simulation source only runs the model on its first pass. Replays (and later
+# runs on the same file) read the boxes back instead.
+#
+# The file name is a hash of everything the boxes depend on: the video's
+# path, size and mtime, plus whatever the caller adds (model, crop regions),
+# so editing the video or swapping the weights starts a fresh cache.
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from detections import Detections
+
+
+def source_key(path, **extra):
+    stat = os.stat(path)
+    identity = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime_ns, **extra}
+    return hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class DetectionCache:
+    def __init__(self, cache_dir, source, **extra):
+        os.makedirs(cache_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        self.path = os.path.join(cache_dir, f"{stem}-{source_key(source, **extra)}.npz")
+        self.entries = {}       # frame index -> Detections
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                index, offsets = data["index"], data["offsets"]
+                xyxy, conf, cls = data["xyxy"], data["conf"], data["cls"]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable detection cache {self.path}: {e}")
+            return
+        for i, frame_index in enumerate(index.tolist()):
+            start, end = offsets[i], offsets[i + 1]
+            self.entries[frame_index] = Detections(xyxy[start:end], conf[start:end], cls[start:end], None)
+        print(f"Loaded {len(self.entries)} cached frames from {self.path}")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, frame_index):
+        detections = self.entries.get(frame_index)
+        if detections is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return detections
+
+    def put(self, frame_index, detections):
+        # track ids are not kept: they would not match on the next pass anyway
+        self.entries[frame_index] = detections._replace(id=None)
+        self._dirty = True
+
+    def save(self):
+        """Writes the cache if it changed. Atomic, so a crash never leaves half a file."""
+        if not self._dirty:
+            return
+        index = sorted(self.entries)
+        parts = [self.entries[i] for i in index]
+        counts = [len(part.xyxy) for part in parts]
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            index=np.array(index, np.int64),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            xyxy=np.concatenate([p.xyxy for p in parts]).astype(np.float32) if parts else np.zeros((0, 4), np.float32),
+            conf=np.concatenate([p.conf for p in parts]).astype(np.float32) if parts else np.zeros(0, np.float32),
+            cls=np.concatenate([p.cls for p in parts]).astype(np.int16) if parts else np.zeros(0, np.int16),
+        )
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -0,0 +1,51 @@
+# detections.py
+from collections import namedtuple
+
+import numpy as np
+
+# Plain NumPy view of one frame's results[0].boxes, so detections can cross
+# process boundaries and come from any inference backend.
+#   xyxy: (N, 4) float32 boxes in frame pixels
+#   conf: (N,) float32 scores
+#   cls:  (N,) int class ids
+#   id:   (N,) int track ids, or None when the boxes were not tracked
+Detections = namedtuple("Detections", ["xyxy", "conf", "cls", "id"])
+
+
+def empty_detections():
+    return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32),
+                      np.zeros(0, int), None)
+
+
+def concat_detections(parts):
+    if not parts:
+        return empty_detections()
+    ids = [part.id for part in parts]
+    return Detections(
+        xyxy=np.concatenate([part.xyxy for part in parts]),
+        conf=np.concatenate([part.conf for part in parts]),
+        cls=np.concatenate([part.cls for part in parts]),
+        id=None if any(i is None for i in ids) else np.concatenate(ids),
+    )
+
+
+def from_boxes(boxes, tracked_only=False):
+    """
+    Converts an ultralytics Boxes object to Detections. With tracked_only,
+    nothing is returned until the tracker has assigned ids, which is how the
+    detector has always gated occupancy in track mode.
+    """
+    if boxes is None or (tracked_only and boxes.id is None):
+        return empty_detections()
+    return Detections(
+        xyxy=boxes.xyxy.cpu().numpy().astype(np.float32),
+        conf=boxes.conf.cpu().numpy().astype(np.float32),
+        cls=boxes.cls.int().cpu().numpy(),
+        id=None if boxes.id is None else boxes.id.int().cpu().numpy(),
+    )
+
+
+def centers(detections):
+    """Integer (N, 2) box centres, the point used to match a vehicle to a slot."""
+    boxes = detections.xyxy.astype(int)
+    return (boxes[:, :2] + boxes[:, 2:]) // 2
@@ -1,140 +1,392 @@
 # detector.py
 import cv2
-import json
 import os
 import numpy as np
-from ultralytics import YOLO
 import cvzone
+import threading
 import time
 
-from firebase_client import update_parking_area
+from detection_cache import DetectionCache
+from detections import centers, concat_detections, empty_detections
+from frame_grabber import FrameGrabber
+from inference_backends import load_backend
+from metrics import DetectorMetrics, MetricsServer
+from motion_gate import MotionGate
+from preview_server import PreviewServer
+from publisher import ParkingPublisher
+from scheduler import ACHIEVED, TARGET
+from stage_timer import NullTimer
+from tracking import KeyframeTracker
+from slot_geometry import PolygonWatcher, SlotGeometry, FRAME_SIZE, load_polygons
+
 
 class ParkingAreaDetector:
-    def __init__(self, area_name, video_source, polygon_file, model_path="best.pt"):
+    def __init__(self, area_name, video_source, polygon_file, model_path="best.pt",
+                 headless=False, target_fps=None, inference=None, publisher=None,
+                 motion_gate=False, refresh_interval=10.0, roi_crop=False,
+                 grabber=None, timer=None, metrics_port=None, backend="auto",
+                 preview_port=None, preview_fps=5.0, detection_cache=None,
+                 keyframe_interval=None, schedule=None, capture="opencv", watch_polygons=True):
         self.area_name = area_name          # "area1" or "area2"
         self.video_source = video_source    # "vid1.mp4" or "vid2.mp4" or RTSP
         self.polygon_file = polygon_file
-        self.model = YOLO(model_path)
-        self.names = self.model.names
-        self.cap = cv2.VideoCapture(video_source)
-        self.frame_count = 0
+        self.headless = headless            # no window, no drawing, no key handling
+        self.draw = not headless
+        self.target_fps = target_fps        # processed frames per second, None = as fast as possible
+        # schedule: a CameraSchedule from a shared BudgetTable; overrides
+        # target_fps with an interval that follows this camera's share of the budget
+        self.schedule = schedule
+        self._last_status = None
+        # inference: an InferenceClient of a shared InferenceServer. Without
+        # one the detector loads its own copy of the model, on the runtime
+        # picked from the file (.pt, .onnx, _openvino_model/) or by `backend`.
+        self.inference = inference
+        self.model = None
+        if inference is None:
+            self.model = load_backend(model_path, backend)
+        # per-stage durations (decode, resize, inference, match, draw, publish);
+        # with metrics_port they are kept as live histograms served over HTTP
+        self.metrics = None
+        self.metrics_server = None
+        if metrics_port is not None and timer is None:
+            self.metrics = timer = DetectorMetrics(area_name)
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
+        self.timer = timer or NullTimer()
+        # optional MJPEG preview; overlays are only drawn while it has viewers
+        self.preview = PreviewServer(area_name, preview_port, max_fps=preview_fps) if preview_port is not None else None
+        # decoding runs on its own thread; only every third frame is decoded.
+        # capture="pyav" decodes straight to the working size, unless ROI
+        # crops need the full-resolution frame
+        self.grabber = grabber or FrameGrabber(video_source, stride=3, timer=self.timer, capture=capture,
+                                               size=None if roi_crop else FRAME_SIZE)
 
+        # results are written to Firebase from a background thread, and only
+        # the slots that changed
+        self.publisher = publisher or ParkingPublisher(area_name, timer=self.timer)
 
         self.polygons = []
-        self.polygon_points = []
         self.paused = False
-        self.last_push_time = 0
+        self._stopped = threading.Event()
 
         self._load_polygons()
+        # edits to the polygon file are picked up while running (validated and
+        # compiled off the frame loop, swapped in between frames)
+        self.polygon_watcher = PolygonWatcher(polygon_file, FRAME_SIZE) if watch_polygons else None
+
+        # optional: skip the model while nothing moves inside the slots and
+        # reuse the previous detections, with a full pass every refresh_interval
+        self.motion_gate = MotionGate(self.geometry, refresh_interval=refresh_interval) if motion_gate else None
+        self.last_detections = empty_detections()
+        self.last_report_time = time.time()
+
+        # optional: run the model only on crops around the slots, taken from
+        # the full-resolution source frame
+        self.roi_crop = roi_crop
+        self.crop_regions = self.geometry.crop_regions() if roi_crop else None
+
+        # optional: run the model every keyframe_interval frames only and
+        # carry the boxes forward with optical flow in between
+        self.tracker = KeyframeTracker(keyframe_interval) if keyframe_interval else None
+
+        # optional: for looped video files, keep the detections of each frame
+        # in <detection_cache>/ and skip the model when the file comes round
+        # again (long load tests of the publish path with many cameras)
+        self.model_path = model_path
+        self.detection_cache = detection_cache
+        self._last_position = -1
+        self.cache = self._open_cache()
 
-        cv2.namedWindow(self.area_name)
-        cv2.setMouseCallback(self.area_name, self._mouse_callback)
+        if self.metrics is not None:
+            self._register_gauges()
+
+        # polygons are edited with polygon_editor.py, the detector only reads them
+        if not self.headless:
+            cv2.namedWindow(self.area_name)
+
+    def _register_gauges(self):
+        metrics = self.metrics
+        metrics.gauge("frames_grabbed", lambda: getattr(self.grabber, "frame_count", 0))
+        metrics.gauge("frames_dropped", lambda: getattr(self.grabber, "dropped", 0))
+        metrics.gauge("publish_writes", lambda: self.publisher.writes)
+        metrics.gauge("publish_failures", lambda: self.publisher.failures)
+        metrics.gauge("slots", lambda: self.geometry.slot_count)
+        if self.polygon_watcher is not None:
+            metrics.gauge("polygon_reloads", lambda: self.polygon_watcher.reloads)
+            metrics.gauge("polygon_errors", lambda: self.polygon_watcher.errors)
+        if self.preview is not None:
+            metrics.gauge("preview_viewers", lambda: self.preview.viewers)
+        if self.schedule is not None:
+            row = self.schedule.table.rows[self.schedule.index]
+            metrics.gauge("target_interval_s", lambda: float(row[TARGET]))
+            metrics.gauge("achieved_interval_s", lambda: float(row[ACHIEVED]))
+        if self.tracker is not None:
+            metrics.gauge("keyframes", lambda: self.tracker.keyframes)
+            metrics.gauge("tracked_frames", lambda: self.tracker.tracked)
+        if self.cache is not None:
+            metrics.gauge("cache_hits", lambda: self.cache.hits)
+            metrics.gauge("cache_misses", lambda: self.cache.misses)
+        if self.motion_gate is not None:
+            metrics.gauge("motion_skip_ratio", lambda: self.motion_gate.skip_ratio)
+
+    def _open_cache(self):
+        if not self.detection_cache or not getattr(self.grabber, "is_file", False):
+            return None
+        key = {"model": self.model_path}
+        if os.path.exists(self.model_path):
+            key["model_mtime"] = os.path.getmtime(self.model_path)
+        if self.roi_crop:
+            key["crop_regions"] = self.crop_regions
+        return DetectionCache(self.detection_cache, self.video_source, **key)
 
     def _load_polygons(self):
         if os.path.exists(self.polygon_file):
             try:
-                with open(self.polygon_file, 'r') as f:
-                    self.polygons = json.load(f)
-            except:
+                self.polygons = load_polygons(self.polygon_file, FRAME_SIZE)
+            except (OSError, ValueError) as e:
+                print(f"{self.area_name}: no slots loaded, {e}")
                 self.polygons = []
+        # compiled once: contours, centroids and the slot label raster
+        self.geometry = SlotGeometry(self.polygons, FRAME_SIZE)
+
+    def _apply_geometry(self, geometry):
+        """Switches to a newly compiled layout between two frames."""
+        self.geometry = geometry
+        self.polygons = geometry.polygons
+        if self.motion_gate is not None:
+            self.motion_gate.set_geometry(geometry)
+        if self.roi_crop:
+            self.crop_regions = geometry.crop_regions()
+            if self.cache is not None:
+                # cached boxes came from the old crops
+                self.cache.save()
+                self.cache = self._open_cache()
+
+    def _detect(self, frame):
+        if self.inference is not None:
+            return self.inference.infer(frame)
+        return self.model.track(frame)
+
+    def _detect_regions(self, raw):
+        """
+        Runs the model on each crop region only and maps the boxes back to
+        working-frame coordinates. Crops are cut from the raw frame, so
+        distant bays keep the source resolution instead of the 1020x500 one.
+        """
+        scale_x = raw.shape[1] / FRAME_SIZE[0]
+        scale_y = raw.shape[0] / FRAME_SIZE[1]
+
+        crops = []
+        for x1, y1, x2, y2 in self.crop_regions:
+            left, top = int(x1 * scale_x), int(y1 * scale_y)
+            crops.append((left, top, raw[top:int(y2 * scale_y), left:int(x2 * scale_x)]))
+
+        if self.inference is not None:
+            found = [self.inference.infer(crop) for _, _, crop in crops]
+        else:
+            # no tracker here: track() would mix up the crops of one frame
+            found = self.model.predict([crop for _, _, crop in crops])
+
+        parts = []
+        for (left, top, _), detections in zip(crops, found):
+            xyxy = detections.xyxy.copy()
+            xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] + left) / scale_x
+            xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] + top) / scale_y
+            parts.append(detections._replace(xyxy=xyxy))
+        return concat_detections(parts)
+
+    def process_frame(self, frame, position=None):
+        """
+        Runs detection on one raw frame, pushes the result to Firebase and
+        returns (frame, slot_status). The frame is only annotated when
+        self.draw is set (a window is shown) or the preview has viewers.
+        `position` is the frame's index in a video file, for the cache.
+        """
+        timer = self.timer
+        if self.polygon_watcher is not None:
+            geometry = self.polygon_watcher.take()
+            if geometry is not None:
+                self._apply_geometry(geometry)
+
+        raw = frame
+        with timer.stage("resize"):
+            if raw.shape[1] == FRAME_SIZE[0] and raw.shape[0] == FRAME_SIZE[1]:
+                frame = raw         # already decoded at the working size
+            else:
+                frame = cv2.resize(raw, FRAME_SIZE)
+
+        use_cache = self.cache is not None and position is not None
+        if use_cache:
+            if position < self._last_position:
+                self.cache.save()       # the file looped, one full pass is cached
+            self._last_position = position
+
+        with timer.stage("motion"):
+            run_model = self.motion_gate is None or self.motion_gate.check(frame)
+        if run_model and self.tracker is not None and not self.tracker.needs_keyframe():
+            with timer.stage("track"):
+                self.last_detections = self.tracker.track(frame)
+        elif run_model:
+            # only frames that would run the model look in the cache, so tracked ones are no misses
+            cached = self.cache.get(position) if use_cache else None
+            if cached is not None:
+                self.last_detections = cached
+            else:
+                with timer.stage("inference"):
+                    if self.crop_regions:
+                        self.last_detections = self._detect_regions(raw)
+                    else:
+                        self.last_detections = self._detect(frame)
+                if use_cache:
+                    self.cache.put(position, self.last_detections)
+            if self.tracker is not None:
+                # a cached keyframe seeds the tracker just like a fresh one
+                self.tracker.keyframe(frame, self.last_detections)
+        detections = self.last_detections
+        geometry = self.geometry
+
+        with timer.stage("match"):
+            points = centers(detections)
+            slots = geometry.lookup(points)
+            occupied = np.zeros(geometry.slot_count, bool)
+            occupied[slots[slots >= 0]] = True
 
-    def _save_polygons(self):
-        with open(self.polygon_file, 'w') as f:
-            json.dump(self.polygons, f)
+        total_zones = geometry.slot_count
+        occupied_zones = int(occupied.sum())
+        free_zones = total_zones - occupied_zones
 
-    def _mouse_callback(self, event, x, y, flags, param):
-        if event == cv2.EVENT_LBUTTONDOWN:
-            self.polygon_points.append((x, y))
-            if len(self.polygon_points) == 4:
-                self.polygons.append(self.polygon_points.copy())
-                self._save_polygons()
-                self.polygon_points.clear()
+        slot_status = {
+            idx + 1: "occupied" if is_occupied else "free"
+            for idx, is_occupied in enumerate(occupied)
+        }
 
-    def run(self):
-        fps = self.cap.get(cv2.CAP_PROP_FPS)
-        delay = int(1000 / fps) if fps and fps > 0 else 30
-        delay *= 3 if self.area_name == "area2" else 20
+        watched = self.preview is not None and self.preview.watched
+        if self.draw or watched:
+            with timer.stage("draw"):
+                self._draw(frame, points[slots >= 0], occupied, free_zones, occupied_zones)
+            if watched:
+                self.preview.submit(frame)
 
-        while True:
+        # queued for the publisher thread, never blocks on the network
+        with timer.stage("publish"):
+            self.publisher.publish(slot_status)
+        timer.frame_done()
+
+        if self.motion_gate is not None and time.time() - self.last_report_time > 60:
+            print(f"{self.area_name} motion gate: {self.motion_gate.stats()}")
+            self.last_report_time = time.time()
+
+        return frame, slot_status
+
+    def _draw(self, frame, hit_centers, occupied, free_zones, occupied_zones):
+        geometry = self.geometry
+        cv2.polylines(frame, geometry.contours, isClosed=True, color=(0, 255, 0), thickness=2)
+
+        for cx, cy in hit_centers:
+            cv2.circle(frame, (int(cx), int(cy)), 4, (255, 0, 255), -1)
+
+        occupied_contours = [c for c, is_occupied in zip(geometry.contours, occupied) if is_occupied]
+        if occupied_contours:
+            cv2.polylines(frame, occupied_contours, isClosed=True, color=(0, 0, 255), thickness=2)
+
+        for idx, (cx, cy) in enumerate(geometry.centroids):
+            color = (0, 0, 255) if occupied[idx] else (0, 255, 0)
+            cv2.putText(frame, f"S{idx + 1}", (int(cx) - 10, int(cy)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2, cv2.LINE_AA)
+
+        cvzone.putTextRect(frame, f'{self.area_name} FREE:{free_zones}', (30, 40), 2, 2)
+        cvzone.putTextRect(frame, f'{self.area_name} OCC:{occupied_zones}', (30, 140), 2, 2)
+
+    def run(self, max_frames=None):
+        self.grabber.start()
+        self.publisher.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        if self.preview is not None:
+            self.preview.start()
+        if self.polygon_watcher is not None:
+            self.polygon_watcher.start()
+        try:
+            if self.headless:
+                self._run_headless(max_frames)
+            else:
+                self._run_window()
+        finally:
+            self.grabber.stop()
+            self.publisher.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            if self.preview is not None:
+                self.preview.stop()
+            if self.polygon_watcher is not None:
+                self.polygon_watcher.stop()
+            if self.cache is not None:
+                self.cache.save()
+
+    def stop(self):
+        """Ends run() from another thread (used by the supervisor)."""
+        self._stopped.set()
+        self.grabber.stop()
+
+    def _refresh(self, raw):
+        """process_frame, plus bookkeeping for the budget scheduler."""
+        if self.schedule is None:
+            return self.process_frame(raw, getattr(self.grabber, "last_position", None))
+
+        start = time.perf_counter()
+        frame, slot_status = self.process_frame(raw, getattr(self.grabber, "last_position", None))
+        previous = self._last_status or {}
+        changed = sum(1 for slot, status in slot_status.items() if previous.get(slot, status) != status)
+        self._last_status = slot_status
+        self.schedule.record(time.perf_counter() - start, changed)
+        return frame, slot_status
+
+    def _interval(self):
+        """Seconds between refreshes: the scheduler's, target_fps, or 0 = as fast as possible."""
+        if self.schedule is not None:
+            return self.schedule.interval()
+        return 1.0 / self.target_fps if self.target_fps else 0
+
+    def _run_headless(self, max_frames=None):
+        # No window and no waitKey: the loop is paced by the model, or by
+        # target_fps / the scheduler when set. Stop with Ctrl+C, stop() or by
+        # terminating the process.
+        next_due = time.perf_counter()
+        processed = 0
+
+        try:
+            while not self._stopped.is_set() and (max_frames is None or processed < max_frames):
+                frame = self.grabber.read()
+                if frame is None:
+                    break
+                self._refresh(frame)
+                processed += 1
+
+                interval = self._interval()
+                if interval:
+                    next_due += interval
+                    sleep_for = next_due - time.perf_counter()
+                    if sleep_for > 0:
+                        self._stopped.wait(sleep_for)
+                    else:
+                        # fell behind, don't try to catch up with a burst
+                        next_due = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+
+    def _run_window(self):
+        fps = self.grabber.get(cv2.CAP_PROP_FPS)
+        source_delay = int(1000 / fps) if fps and fps > 0 else 30
+
+        frame = None
+        while not self._stopped.is_set():
             if not self.paused:
-                ret, frame = self.cap.read()
-                self.frame_count += 1
-                if self.frame_count % 3 != 0:
-                    continue
-
-
-                # if this is a file, loop it; if it's a camera, you may want to break instead
-                if not ret:
-                    # for simulation (video file)
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-
-                frame = cv2.resize(frame, (1020, 500))
-                results = self.model.track(frame, persist=True)
-
-                # draw polygons
-                for poly in self.polygons:
-                    pts = np.array(poly, np.int32).reshape((-1, 1, 2))
-                    cv2.polylines(frame, [pts], isClosed=True, color=(0, 255, 0), thickness=2)
-
-                occupied_slots = set()
-                slot_status = {}
-
-                if results and results[0].boxes.id is not None:
-                    ids = results[0].boxes.id.cpu().numpy().astype(int)
-                    boxes = results[0].boxes.xyxy.cpu().numpy().astype(int)
-                    class_ids = results[0].boxes.cls.int().cpu().tolist()
-
-                    for track_id, box, class_id in zip(ids, boxes, class_ids):
-                        x1, y1, x2, y2 = box
-                        cx = int((x1 + x2) / 2)
-                        cy = int((y1 + y2) / 2)
-
-
-                        for idx, poly in enumerate(self.polygons):
-                            pts = np.array(poly, np.int32).reshape((-1, 1, 2))
-                            if cv2.pointPolygonTest(pts, (cx, cy), False) >= 0:
-                                cv2.circle(frame, (cx, cy), 4, (255, 0, 255), -1)
-                                cv2.polylines(frame, [pts], isClosed=True, color=(0, 0, 255), thickness=2)
-                                occupied_slots.add(idx)
-                                break
-
-                total_zones = len(self.polygons)
-                occupied_zones = len(occupied_slots)
-                free_zones = total_zones - occupied_zones
-
-                # Build slot_status and draw labels
-                for idx, poly in enumerate(self.polygons):
-                    slot_id = idx + 1
-                    is_occupied = idx in occupied_slots
-                    slot_status[slot_id] = "occupied" if is_occupied else "free"
-
-                    pts = np.array(poly, np.int32)
-                    cx = int(pts[:, 0].mean())
-                    cy = int(pts[:, 1].mean())
-                    color = (0, 0, 255) if is_occupied else (0, 255, 0)
-                    label = f"S{slot_id}"
-                    cv2.putText(frame, label, (cx - 10, cy),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2, cv2.LINE_AA)
-
-                cvzone.putTextRect(frame, f'{self.area_name} FREE:{free_zones}', (30, 40), 2, 2)
-                cvzone.putTextRect(frame, f'{self.area_name} OCC:{occupied_zones}', (30, 140), 2, 2)
-
-                # push to Firebase every 2 seconds
-                now = time.time()
-                if now - self.last_push_time > 2:
-                    update_parking_area(
-                        area_name=self.area_name,
-                        slot_status=slot_status,
-                        total_slots=total_zones,
-                        free_slots=free_zones,
-                        occupied_slots=occupied_zones
-                    )
-                    self.last_push_time = now
-
-                # draw in-progress polygon points
-                for pt in self.polygon_points:
-                    cv2.circle(frame, pt, 5, (0, 0, 255), -1)
+                raw = self.grabber.read()
+                if raw is None:
+                    break
+                frame, _ = self._refresh(raw)
+
+            interval = self._interval()
+            delay = max(1, int(interval * 1000)) if interval else source_delay
 
             cv2.imshow(self.area_name, frame)
             key = cv2.waitKey(delay if not self.paused else 0) & 0xFF
@@ -143,9 +395,5 @@ class ParkingAreaDetector:
                 break
             elif key == 32:
                 self.paused = not self.paused
-            elif key == ord('r') and self.polygons:
-                self.polygons.pop()
-                self._save_polygons()
 
-        self.cap.release()
         cv2.destroyWindow(self.area_name)
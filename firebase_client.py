@@ -36,6 +36,15 @@ def update_parking_area(area_name: str, slot_status: dict,
     }
     ref.set(data)
 
+def update_parking_paths(area_name: str, updates: dict):
+    """
+    Multi-path update under parking/<area_name>. Only the given paths are
+    written, e.g. {"slots/3/status": "occupied", "free_slots": 12}.
+    A None value deletes the node.
+    """
+    ref = db.reference(f"parking/{area_name}")
+    ref.update(updates)
+
 def get_parking_data(area_name: str = None):
     """
     Reads parking data. If area_name provided, returns that area.
@@ -35,4 +35,23 @@ def get_prediction_from_firestore(area_name, timestamp_str):
     
     if doc.exists:
         return doc.to_dict()
-    return None
\ No newline at end of file
+    return None
+
+def save_predictions_to_firestore(predictions):
+    """
+    Stores many predictions with batched writes, one round trip per 500
+    documents (Firestore's batch limit). `predictions` is a list of
+    (area_name, timestamp_str, free_slots).
+    """
+    for start in range(0, len(predictions), 500):
+        batch = db.batch()
+        for area_name, timestamp_str, free_slots in predictions[start:start + 500]:
+            doc_ref = db.collection("predictions").document(f"{area_name}_{timestamp_str}")
+            batch.set(doc_ref, {
+                "area_name": area_name,
+                "prediction_time": timestamp_str,
+                "free_slots": free_slots,
+                "created_at": firestore.SERVER_TIMESTAMP
+            })
+        batch.commit()
+    print(f"Saved {len(predictions)} predictions to Firestore")
@@ -0,0 +1,133 @@
+# frame_grabber.py
+import os
+import threading
+from collections import deque
+
+import cv2
+
+from stage_timer import NullTimer
+from video_source import open_capture
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Background capture stage. Decoding runs on this thread while the detector
+    runs inference on its own, and only every `stride`-th frame is decoded:
+    the others are grab()bed (demuxed) but never retrieve()d.
+
+    Frames are handed over through a bounded queue. For live sources (RTSP,
+    cameras) the oldest frame is dropped when the queue is full, so a slow
+    detector always gets the newest frame instead of building lag. Video
+    files are not live, so there the grabber waits for the detector instead
+    of dropping, and loops the file at the end for simulation. For files the
+    stride counts from the start of the file, so every loop decodes the same
+    frames; read() leaves the frame's index in the file in last_position.
+
+    capture="pyav" decodes with PyAV instead (video_source.py): threaded,
+    converted straight to `size`, and with stride > 1 the decoder drops
+    non-reference frames. The grabber then keeps the first frame at or after
+    each stride step.
+    """
+
+    def __init__(self, source, stride=3, maxsize=1, reconnect_delay=2.0, timer=None,
+                 capture="opencv", size=None):
+        super().__init__(name=f"grabber-{source}", daemon=True)
+        self.source = source
+        self.stride = max(1, stride)
+        self.reconnect_delay = reconnect_delay
+        self.timer = timer or NullTimer()
+        # only cameras (an index) and URLs are live and worth reconnecting to;
+        # anything else is a video file, and a missing one is an error
+        live = not isinstance(source, str) or source.isdigit() or "://" in source
+        if not live and not os.path.isfile(source):
+            raise FileNotFoundError(f"Video file not found: {source}")
+        self.is_file = not live
+        self.capture = capture
+        self.size = size if capture == "pyav" else None     # (width, height) of decoded frames
+        self.cap = self._open()
+
+        self.frame_count = 0        # frames grabbed from the source
+        self.position = -1          # index of the last grabbed frame (restarts when a file loops)
+        self.last_position = None   # index of the frame last returned by read()
+        self._next_decode = 0
+        self.dropped = 0            # decoded frames replaced before being read
+        self._frames = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+    def _open(self):
+        return open_capture(self.source, self.capture, size=self.size, skip_nonref=self.stride > 1)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self.timer.stage("grab"):
+                grabbed = self.cap.grab()
+            if not grabbed:
+                self._handle_end_of_stream()
+                continue
+
+            self.frame_count += 1
+            # PyAV numbers frames by timestamp, since skipped ones leave gaps
+            self.position = getattr(self.cap, "frame_index", self.position + 1)
+            if self.position < self._next_decode:
+                continue
+            self._next_decode = self.position + self.stride
+
+            with self.timer.stage("decode"):
+                ok, frame = self.cap.retrieve()
+            if not ok:
+                continue
+            self._put((self.position, frame))
+
+        self.cap.release()
+
+    def _handle_end_of_stream(self):
+        if self.is_file:
+            if not self.cap.isOpened():
+                print(f"Cannot open video file {self.source}")
+                self.stop()
+                return
+            # for simulation (video file)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.position = -1
+            self._next_decode = 0
+            return
+        # live source dropped, try to reopen it
+        self.cap.release()
+        self._stopped.wait(self.reconnect_delay)
+        if not self._stopped.is_set():
+            self.cap = self._open()
+            self.position = -1
+            self._next_decode = 0
+
+    def _put(self, item):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                if self.is_file:
+                    self._cond.wait_for(
+                        lambda: len(self._frames) < self._frames.maxlen or self._stopped.is_set())
+                else:
+                    self.dropped += 1   # deque(maxlen) drops the oldest on append
+            self._frames.append(item)
+            self._cond.notify_all()
+
+    def read(self, timeout=None):
+        """Returns the oldest queued frame, or None on timeout / after stop()."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self._stopped.is_set(), timeout):
+                return None
+            if not self._frames:
+                return None
+            self.last_position, frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=5)
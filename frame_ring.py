@@ -0,0 +1,120 @@
+# frame_ring.py
+# Fixed-size frame slots in shared memory, so frames cross process boundaries
+# without being pickled. The producer copies a frame into the next slot once
+# and sends only its sequence number; the consumer gets a NumPy view straight
+# onto the shared buffer.
+#
+# Layout: a header of int64 counters (write / read index, overwrites), one
+# small record per slot (sequence number + frame shape) and then the slots
+# themselves. A slot's sequence number is cleared while it is being written,
+# so a reader can tell a frame that was replaced under it (seqlock style).
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_HEADER = 8         # int64 fields: write, read, overwritten, slots, slot_bytes, unused
+_RECORD = 8         # int64 fields per slot: seq, ndim, shape[0..5]
+_ALIGN = 64
+
+_WRITE, _READ, _OVERWRITTEN, _SLOTS, _SLOT_BYTES = range(5)
+
+
+def _data_offset(slots):
+    size = (_HEADER + _RECORD * slots) * 8
+    return -(-size // _ALIGN) * _ALIGN
+
+
+def _attach(name):
+    try:
+        # the creator owns the segment; attaching processes must not unlink it
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track=; spawn children share the parent's
+        # resource tracker, which unlinks the segment only once
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """
+    Single-producer / single-consumer ring of uint8 frames. Pass it to another
+    process as a Process argument: it is pickled by name and re-attached.
+    """
+
+    def __init__(self, slots=4, slot_bytes=1920 * 1080 * 3, name=None):
+        if name is None:
+            slot_bytes = -(-slot_bytes // _ALIGN) * _ALIGN
+            self.shm = shared_memory.SharedMemory(create=True, size=_data_offset(slots) + slots * slot_bytes)
+            self.owner = True
+            counters = np.ndarray((_HEADER,), np.int64, self.shm.buf)
+            counters[:] = 0
+            counters[_SLOTS] = slots
+            counters[_SLOT_BYTES] = slot_bytes
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+            counters = np.ndarray((_HEADER,), np.int64, self.shm.buf)
+            slots, slot_bytes = int(counters[_SLOTS]), int(counters[_SLOT_BYTES])
+
+        self.name = self.shm.name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._counters = counters
+        self._records = np.ndarray((slots, _RECORD), np.int64, self.shm.buf, _HEADER * 8)
+        if self.owner:
+            self._records[:, 0] = -1
+        self._data_offset = _data_offset(slots)
+
+    def __reduce__(self):
+        return FrameRing, (None, None, self.name)
+
+    @property
+    def overwritten(self):
+        """Frames replaced before the consumer released them."""
+        return int(self._counters[_OVERWRITTEN])
+
+    def fits(self, frame):
+        return frame.dtype == np.uint8 and frame.nbytes <= self.slot_bytes and frame.ndim <= _RECORD - 2
+
+    def _view(self, slot, shape):
+        return np.ndarray(shape, np.uint8, self.shm.buf, self._data_offset + slot * self.slot_bytes)
+
+    def write(self, frame):
+        """Copies `frame` into the next slot and returns its sequence number."""
+        counters = self._counters
+        seq = int(counters[_WRITE]) + 1
+        if seq - int(counters[_READ]) > self.slots:
+            # the consumer fell a whole ring behind; the oldest frame is lost
+            counters[_OVERWRITTEN] += 1
+
+        slot = seq % self.slots
+        record = self._records[slot]
+        record[0] = -1                          # being written
+        record[1] = frame.ndim
+        record[2:2 + frame.ndim] = frame.shape
+        np.copyto(self._view(slot, frame.shape), frame)
+        record[0] = seq
+        counters[_WRITE] = seq
+        return seq
+
+    def read(self, seq):
+        """Zero-copy view of frame `seq`, or None if it was already replaced."""
+        record = self._records[seq % self.slots]
+        if record[0] != seq:
+            return None
+        return self._view(seq % self.slots, tuple(record[2:2 + record[1]].tolist()))
+
+    def valid(self, seq):
+        """True while frame `seq` is still in its slot; check after using a view."""
+        return self._records[seq % self.slots, 0] == seq
+
+    def release(self, seq):
+        """Marks everything up to `seq` as consumed."""
+        if seq > self._counters[_READ]:
+            self._counters[_READ] = seq
+
+    def close(self):
+        # views into the buffer must be gone before the mapping can close
+        self._counters = self._records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
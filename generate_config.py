@@ -27,12 +27,14 @@ def generate_config():
             "name": "Area 1",
             "description": "23 slots",
             "location": {"lat": base_lat, "lng": base_lng},
+            "model_slot_offset": 0,     # area1 slot 1 is model slot "1"
             "slots": area1_slots
         },
         "area2": {
             "name": "Area 2", 
             "description": "37 slots",
             "location": {"lat": base_lat + 0.001, "lng": base_lng + 0.001},
+            "model_slot_offset": 23,    # area2 slot 1 is model slot "24"
             "slots": area2_slots
         }
     }
@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+# Production server for api.py:
+#
+#   gunicorn -c gunicorn.conf.py                      # the API, port 5000
+#   API_ROLE=stream gunicorn -c gunicorn.conf.py      # /parking/stream, port 5001
+#
+# The master imports the app and loads the encoders, prediction table and
+# config once (preload_app); the workers fork from it and share those pages
+# copy-on-write. Firebase clients and background threads cannot cross a
+# fork, so each worker starts its own in post_fork.
+#
+# Every open /parking/stream connection holds one worker thread for as long
+# as the client stays. The API role therefore allows only a quarter of its
+# threads to stream (PARKING_STREAM_LIMIT), so streams cannot starve
+# /parking, /predict and /ready; extra streams get a 503. For many
+# subscribers, run the stream role as well and have the reverse proxy send
+# /parking/stream there: one worker with thousands of mostly idle threads,
+# all fed by that worker's single parking listener.
+import gc
+import multiprocessing
+import os
+import threading
+
+role = os.getenv("API_ROLE", "api")
+
+wsgi_app = "api:create_app(services=False)"
+preload_app = True
+worker_class = "gthread"
+timeout = 60
+keepalive = 75
+graceful_timeout = 10
+accesslog = "-"
+
+if role == "stream":
+    bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    threads = int(os.getenv("GUNICORN_THREADS", "2048"))
+    worker_connections = threads + 64
+    # keep a few threads for /ready and /health
+    os.environ.setdefault("PARKING_STREAM_LIMIT", str(threads - 32))
+else:
+    bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+    workers = int(os.getenv("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+    threads = int(os.getenv("GUNICORN_THREADS", "32"))
+    os.environ.setdefault("PARKING_STREAM_LIMIT", str(threads // 4))
+
+
+def pre_fork(server, worker):
+    # keep the loaded objects out of the collector's way, so it never touches
+    # (and un-shares) their pages in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if role == "stream":
+        # streaming threads only wait on a queue; small stacks keep thousands cheap
+        threading.stack_size(1024 * 1024)
+    import api
+    api.start_services()
+
+
+def worker_exit(server, worker):
+    import api
+    api.stop_services()
@@ -0,0 +1,201 @@
+# inference_backends.py
+# Model runtimes the detector can use. Every backend returns Detections (the
+# NumPy form of results[0].boxes), so the rest of the pipeline does not care
+# whether PyTorch, ONNX Runtime or OpenVINO produced the boxes.
+#
+#   best.pt                  -> UltralyticsBackend (PyTorch, supports tracking)
+#   best.onnx                -> OnnxRuntimeBackend (no torch needed)
+#   best_openvino_model/     -> OpenVinoBackend    (no torch needed, int8 capable)
+#
+# Exported models come from ultralytics, e.g.
+#   yolo export model=best.pt format=onnx            (add half=True for fp16)
+#   yolo export model=best.pt format=openvino int8=True data=<dataset.yaml>
+import ast
+import os
+
+import cv2
+import numpy as np
+
+from detections import Detections, empty_detections, from_boxes
+
+
+class UltralyticsBackend:
+    """The original path: ultralytics YOLO on its default (PyTorch) runtime."""
+
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+
+    def predict(self, frames):
+        return [from_boxes(result.boxes) for result in self.model.predict(frames, verbose=False)]
+
+    def track(self, frame):
+        results = self.model.track(frame, persist=True)
+        return from_boxes(results[0].boxes if results else None, tracked_only=True)
+
+
+class _ExportedYoloBackend:
+    """
+    Shared pre/post-processing for YOLOv8 detection models exported from
+    ultralytics: letterbox to a square input, one (4 + classes, anchors)
+    output, confidence filter and per-class NMS. Exported graphs carry no
+    tracker, so track() is plain prediction.
+    """
+
+    def __init__(self, conf=0.25, iou=0.7, max_det=300):
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.imgsz = 640
+        self.batch = 1              # frames per runtime call
+        self.fixed_batch = True     # default exports have a static batch axis
+        self.half = False
+        self.names = {}
+
+    def _infer(self, blob):
+        raise NotImplementedError
+
+    def _letterbox(self, frame):
+        height, width = frame.shape[:2]
+        ratio = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = round(width * ratio), round(height * ratio)
+        left, top = (self.imgsz - new_w) // 2, (self.imgsz - new_h) // 2
+
+        canvas = np.full((self.imgsz, self.imgsz, 3), 114, np.uint8)
+        canvas[top:top + new_h, left:left + new_w] = cv2.resize(frame, (new_w, new_h),
+                                                                interpolation=cv2.INTER_LINEAR)
+        return canvas, ratio, left, top
+
+    def _decode(self, output, ratio, left, top, shape):
+        pred = output.T.astype(np.float32)                  # (anchors, 4 + classes)
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        keep = conf >= self.conf
+        if not keep.any():
+            return empty_detections()
+
+        pred, cls, conf = pred[keep], cls[keep], conf[keep]
+        xywh = pred[:, :4].copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2                      # centre -> top-left
+        picked = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(),
+                                         self.conf, self.iou, top_k=self.max_det)
+        picked = np.array(picked, int).reshape(-1)
+        if not len(picked):
+            return empty_detections()
+
+        xyxy = np.hstack([xywh[picked, :2], xywh[picked, :2] + xywh[picked, 2:]])
+        xyxy -= np.array([left, top, left, top], np.float32)
+        xyxy /= ratio
+        height, width = shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return Detections(xyxy.astype(np.float32), conf[picked].astype(np.float32),
+                          cls[picked].astype(int), None)
+
+    def predict(self, frames):
+        results = []
+        step = max(1, self.batch)
+        for start in range(0, len(frames), step):
+            chunk = frames[start:start + step]
+            boxes = [self._letterbox(frame) for frame in chunk]
+            blob = np.stack([canvas for canvas, _, _, _ in boxes])[..., ::-1]   # BGR -> RGB
+            blob = np.ascontiguousarray(blob.transpose(0, 3, 1, 2), np.float16 if self.half else np.float32)
+            blob /= 255
+            if self.fixed_batch and len(chunk) < step:
+                # static batch axis: pad the short last chunk
+                blob = np.concatenate([blob, np.zeros((step - len(chunk),) + blob.shape[1:], blob.dtype)])
+            outputs = self._infer(blob)
+            for frame, (_, ratio, left, top), output in zip(chunk, boxes, outputs):
+                results.append(self._decode(output, ratio, left, top, frame.shape))
+        return results
+
+    def track(self, frame):
+        return self.predict([frame])[0]
+
+
+class OnnxRuntimeBackend(_ExportedYoloBackend):
+    def __init__(self, model_path, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.half = "float16" in model_input.type
+        batch, _, height, _ = model_input.shape
+        self.fixed_batch = isinstance(batch, int)
+        self.batch = batch if self.fixed_batch else 16
+        self.imgsz = height if isinstance(height, int) else 640
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self.names = ast.literal_eval(metadata["names"])
+        if "imgsz" in metadata:
+            self.imgsz = ast.literal_eval(metadata["imgsz"])[0]
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_ExportedYoloBackend):
+    def __init__(self, model_path, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        import openvino as ov
+
+        model_dir = model_path if os.path.isdir(model_path) else os.path.dirname(model_path)
+        xml = model_path
+        if os.path.isdir(model_path):
+            xml = next(os.path.join(model_path, f) for f in os.listdir(model_path) if f.endswith(".xml"))
+
+        core = ov.Core()
+        model = core.read_model(xml)
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+
+        shape = model.input(0).get_partial_shape()
+        self.fixed_batch = shape[0].is_static
+        self.batch = shape[0].get_length() if self.fixed_batch else 16
+        if shape[2].is_static:
+            self.imgsz = shape[2].get_length()
+
+        metadata_file = os.path.join(model_dir, "metadata.yaml")
+        if os.path.exists(metadata_file):
+            import yaml
+            with open(metadata_file) as f:
+                self.names = yaml.safe_load(f).get("names", {})
+
+    def _infer(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+def load_backend(model_path, backend="auto", threads=None):
+    """
+    Picks the runtime from the model file unless `backend` names one of
+    "ultralytics", "onnxruntime" or "openvino".
+    """
+    if backend == "auto":
+        path = model_path.rstrip("/\\")
+        if path.endswith(".onnx"):
+            backend = "onnxruntime"
+        elif path.endswith("_openvino_model") or path.endswith(".xml"):
+            backend = "openvino"
+        else:
+            backend = "ultralytics"
+
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(model_path, threads=threads)
+    if backend == "openvino":
+        return OpenVinoBackend(model_path, threads=threads)
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path)
+    raise ValueError(f"Unknown inference backend: {backend}")
@@ -0,0 +1,189 @@
+# inference_server.py
+# One process owns the YOLO weights and serves every camera. Camera processes
+# send requests through a shared request queue; the server drains whatever is
+# waiting (up to max_batch), runs a single batched model call and routes each
+# result back to the requesting area's response queue.
+#
+# Frames themselves do not go through the queue: each camera has a FrameRing
+# in shared memory, the request only carries the frame's sequence number and
+# the server runs the model on a view of the shared slot.
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from frame_ring import FrameRing
+from inference_backends import load_backend
+
+
+class InferenceClient:
+    """Handle a detector uses instead of its own model. Picklable, so it can be
+    passed to a camera process as a Process argument."""
+
+    def __init__(self, area_name, requests, responses, ring=None):
+        self.area_name = area_name
+        self._requests = requests
+        self._responses = responses
+        self._ring = ring
+        self._ids = itertools.count()
+
+    def infer(self, frame, timeout=30):
+        """Sends one frame and blocks until its Detections come back."""
+        # the pid keeps ids unique when a restarted camera process reuses the
+        # queues of the one before it
+        request_id = (os.getpid(), next(self._ids))
+        if self._ring is not None and self._ring.fits(frame):
+            payload = self._ring.write(frame)       # only the sequence number is pickled
+        else:
+            payload = frame
+        self._requests.put((self.area_name, request_id, payload))
+        while True:
+            response_id, detections = self._responses.get(timeout=timeout)
+            # a reply to an earlier request that timed out, drop it
+            if response_id != request_id:
+                continue
+            if detections is None:
+                # the shared slot was reused before the server got to it
+                # (only after earlier timeouts); send this frame by value
+                return self._infer_copy(frame, timeout)
+            return detections
+
+    def _infer_copy(self, frame, timeout):
+        request_id = (os.getpid(), next(self._ids))
+        self._requests.put((self.area_name, request_id, frame))
+        while True:
+            response_id, detections = self._responses.get(timeout=timeout)
+            if response_id == request_id:
+                return detections
+
+
+class InferenceServer:
+    def __init__(self, model_path="best.pt", max_batch=8, max_wait=0.005, backend="auto", ctx=None,
+                 shared_frames=True, ring_slots=4, max_frame_bytes=1920 * 1080 * 3):
+        self.model_path = model_path
+        self.backend = backend
+        self.max_batch = max_batch      # frames per model call
+        self.max_wait = max_wait        # seconds to wait for a batch to fill up
+        # frames up to max_frame_bytes go through a shared-memory ring per
+        # camera; larger ones (and everything with shared_frames=False) are
+        # pickled through the queue
+        self.shared_frames = shared_frames
+        self.ring_slots = ring_slots
+        self.max_frame_bytes = max_frame_bytes
+        self.rings = {}                 # area_name -> FrameRing
+        # queues must come from the same multiprocessing context as the
+        # camera processes they are passed to
+        self.ctx = ctx or multiprocessing.get_context()
+        self.requests = self.ctx.Queue()
+        self.responses = {}             # area_name -> Queue
+        self.process = None
+
+    def client(self, area_name):
+        """Registers a camera. Must be called before start()."""
+        if self.process is not None:
+            raise RuntimeError("register all cameras before starting the server")
+        self.responses[area_name] = self.ctx.Queue()
+        if self.shared_frames:
+            self.rings[area_name] = FrameRing(self.ring_slots, self.max_frame_bytes)
+        return InferenceClient(area_name, self.requests, self.responses[area_name], self.rings.get(area_name))
+
+    def start(self):
+        self.process = self.ctx.Process(
+            target=serve,
+            args=(self.model_path, self.requests, self.responses, self.max_batch, self.max_wait,
+                  self.backend, self.rings),
+            name="inference-server",
+            daemon=True
+        )
+        self.process.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def restart(self):
+        """Starts a fresh server process on the same queues after a crash."""
+        self.process = None
+        self.start()
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+        # frames nobody will read may still fill the pipe; do not block exit on them
+        self.requests.cancel_join_thread()
+        self.process = None
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+def _collect_batch(requests, max_batch, max_wait):
+    """Blocks for the first request, then takes what arrives within max_wait."""
+    first = requests.get()
+    if first is None:
+        return None
+
+    batch = [first]
+    deadline = time.perf_counter() + max_wait
+    while len(batch) < max_batch:
+        remaining = deadline - time.perf_counter()
+        try:
+            item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            # finish this batch, then stop
+            requests.put(None)
+            break
+        batch.append(item)
+    return batch
+
+
+def serve(model_path, requests, responses, max_batch=8, max_wait=0.005, backend="auto", rings=None):
+    # Ctrl+C reaches the whole process group. The supervisor stops the cameras
+    # first and then us, so frames still in flight get their answers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    model = load_backend(model_path, backend)
+    print(f"Inference server ready with {model_path} for {len(responses)} cameras")
+
+    rings = rings or {}
+
+    while True:
+        batch = _collect_batch(requests, max_batch, max_wait)
+        if batch is None:
+            break
+
+        frames, pending = [], []
+        for area_name, request_id, payload in batch:
+            if isinstance(payload, int):
+                # a sequence number in the camera's ring: a view, no copy
+                frame = rings[area_name].read(payload)
+                if frame is None:
+                    responses[area_name].put((request_id, None))
+                    continue
+            else:
+                frame = payload
+            frames.append(frame)
+            pending.append((area_name, request_id, payload))
+        if not frames:
+            continue
+
+        # predict, not track: a tracker keeps per-stream state and cannot be
+        # shared across cameras in one batch. Occupancy only needs the boxes.
+        results = model.predict(frames)
+        del frames
+
+        for (area_name, request_id, payload), detections in zip(pending, results):
+            if isinstance(payload, int):
+                ring = rings[area_name]
+                if not ring.valid(payload):
+                    detections = None       # overwritten while the model read it
+                ring.release(payload)
+            responses[area_name].put((request_id, detections))
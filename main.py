@@ -1,29 +1,63 @@
+from supervisor import Supervisor, load_manifest
+import argparse
 
-from detector import ParkingAreaDetector
-from multiprocessing import Process
-
-def run_area1():
-    area1_detector = ParkingAreaDetector(
-        area_name="area1",
-        video_source="11.mp4",          # or RTSP URL / camera index
-        polygon_file="polygons1.json"
-    )
-    area1_detector.run()
-
-def run_area2():
-    area2_detector = ParkingAreaDetector(
-        area_name="area2",
-        video_source="vid1.mp4",
-        polygon_file="polygons2.json"
-    )
-    area2_detector.run()
+# Cameras are listed in cameras.json (area, source, polygons, model, target
+# fps, ...). The supervisor runs them on a worker pool and restarts crashed
+# workers; see supervisor.py for all manifest options.
 
 if __name__ == "__main__":
-    p1 = Process(target=run_area1)
-    p2 = Process(target=run_area2)
+    parser = argparse.ArgumentParser(description="Run the parking detectors")
+    parser.add_argument("--manifest", default="cameras.json",
+                        help="camera manifest to run")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without preview windows (for servers)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="target processed frames per second per camera")
+    parser.add_argument("--capture", choices=["opencv", "pyav"], default=None,
+                        help="video decoder; pyav decodes threaded and straight to the working size")
+    parser.add_argument("--shared-model", action="store_true",
+                        help="load the model once and batch inference for all cameras")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="skip inference while nothing moves inside the slots")
+    parser.add_argument("--roi-crop", action="store_true",
+                        help="run the model only on the frame regions around the slots")
+    parser.add_argument("--keyframe", type=int, default=None, metavar="N",
+                        help="run the model every N frames and track the boxes with optical flow in between")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve live metrics from this port on, one port per camera")
+    parser.add_argument("--preview-port", type=int, default=None,
+                        help="serve an annotated MJPEG preview from this port on, one port per camera")
+    parser.add_argument("--detection-cache", default=None, metavar="DIR",
+                        help="cache detections of looped video files in DIR and skip the model on replays")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
 
-    p1.start()
-    p2.start()
+    # command line flags override the manifest for every camera
+    if args.shared_model:
+        manifest["shared_model"] = True
+    if args.workers:
+        manifest["workers"] = args.workers
+    for index, camera in enumerate(manifest["cameras"]):
+        if args.headless:
+            camera["headless"] = True
+        if args.capture:
+            camera["capture"] = args.capture
+        if args.fps:
+            camera["target_fps"] = args.fps
+        if args.motion_gate:
+            camera["motion_gate"] = True
+        if args.roi_crop:
+            camera["roi_crop"] = True
+        if args.keyframe:
+            camera["keyframe_interval"] = args.keyframe
+        if args.metrics_port:
+            camera["metrics_port"] = args.metrics_port + index
+        if args.detection_cache:
+            camera["detection_cache"] = args.detection_cache
+        if args.preview_port:
+            camera["preview_port"] = args.preview_port + index
 
-    p1.join()
-    p2.join()
\ No newline at end of file
+    Supervisor(manifest).run()
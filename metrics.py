@@ -0,0 +1,195 @@
+# metrics.py
+# Live counters and latency histograms for one detector process, served as
+# Prometheus text (/metrics) or JSON (/metrics.json) from a small local HTTP
+# server, so a supervisor or Prometheus can scrape every camera.
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stage_timer import NullTimer
+
+# seconds; covers everything from a label lookup to a slow network write
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)     # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """Estimate from the buckets, interpolating linearly inside one."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = self.buckets[idx - 1] if idx > 0 else 0.0
+                high = self.buckets[idx] if idx < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class DetectorMetrics(NullTimer):
+    """
+    Drop-in timer for the detector pipeline that also keeps counters and
+    gauges. Stage durations go to one histogram per stage; gauges are
+    callables read at scrape time (e.g. the grabber's dropped-frame count).
+    """
+
+    def __init__(self, area_name, fps_window=10.0):
+        self.area_name = area_name
+        self.fps_window = fps_window
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._frame_times = deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def frame_done(self):
+        now = time.monotonic()
+        with self._lock:
+            self.counters["frames_processed"] = self.counters.get("frames_processed", 0) + 1
+            self._frame_times.append(now)
+            while self._frame_times and now - self._frame_times[0] > self.fps_window:
+                self._frame_times.popleft()
+
+    def fps(self):
+        with self._lock:
+            if len(self._frame_times) < 2:
+                return 0.0
+            span = self._frame_times[-1] - self._frame_times[0]
+            return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+        gauges["fps"] = round(self.fps(), 2)
+
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 3) if h.count else None,
+                    "p50_ms": _ms(h.percentile(50)),
+                    "p95_ms": _ms(h.percentile(95)),
+                    "p99_ms": _ms(h.percentile(99)),
+                }
+                for name, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+
+        return {
+            "area": self.area_name,
+            "uptime_s": round(time.time() - self.started, 1),
+            "counters": counters,
+            "gauges": gauges,
+            "stages": stages,
+        }
+
+    def prometheus(self):
+        area = self.area_name
+        lines = []
+        snapshot = self.snapshot()
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE parking_{name}_total counter")
+            lines.append(f'parking_{name}_total{{area="{area}"}} {value}')
+        for name, value in snapshot["gauges"].items():
+            if value is None:
+                continue
+            lines.append(f"# TYPE parking_{name} gauge")
+            lines.append(f'parking_{name}{{area="{area}"}} {float(value)}')
+
+        lines.append("# TYPE parking_stage_seconds histogram")
+        with self._lock:
+            for stage, h in self.histograms.items():
+                labels = f'area="{area}",stage="{stage}"'
+                cumulative = 0
+                bounds = [str(b) for b in h.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, h.counts):
+                    cumulative += count
+                    lines.append(f'parking_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"parking_stage_seconds_sum{{{labels}}} {h.sum}")
+                lines.append(f"parking_stage_seconds_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class MetricsServer(threading.Thread):
+    """Serves one DetectorMetrics on http://<host>:<port>/metrics[.json]."""
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        super().__init__(name=f"metrics-{metrics.area_name}", daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = metrics.prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(metrics.snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass    # scrapes every few seconds would flood the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+
+    def run(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,9 +1,3 @@
-import pandas as pd
-import numpy as np
-import xgboost as xgb
-from xgboost import XGBClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import pickle
 import os
 
@@ -12,6 +6,11 @@ ENCODER_FILE = "label_encoder.pkl"
 SLOT_ENCODER_FILE = "slot_encoder.pkl"
 
 def train_and_save_model(csv_path="on-street-parking-bay-sensors (1).csv"):
+    # imported here: the API only loads the pickles and should not pay for these at startup
+    import pandas as pd
+    from xgboost import XGBClassifier
+    from sklearn.preprocessing import LabelEncoder
+
     print("Loading dataset...")
     if not os.path.exists(csv_path):
         print(f"Error: {csv_path} not found.")
@@ -90,17 +89,26 @@ def train_and_save_model(csv_path="on-street-parking-bay-sensors (1).csv"):
     print(f"Model saved to {MODEL_FILE}")
     print(f"Encoders saved to {ENCODER_FILE}, {SLOT_ENCODER_FILE}")
 
-def load_model_and_encoders():
-    if not os.path.exists(MODEL_FILE) or not os.path.exists(ENCODER_FILE) or not os.path.exists(SLOT_ENCODER_FILE):
-        return None, None, None
-    
-    with open(MODEL_FILE, "rb") as f:
-        model = pickle.load(f)
+def load_encoders():
+    if not os.path.exists(ENCODER_FILE) or not os.path.exists(SLOT_ENCODER_FILE):
+        return None, None
     with open(ENCODER_FILE, "rb") as f:
         le = pickle.load(f)
     with open(SLOT_ENCODER_FILE, "rb") as f:
         slot_le = pickle.load(f)
-    return model, le, slot_le
+    return le, slot_le
+
+def load_model():
+    if not os.path.exists(MODEL_FILE):
+        return None
+    with open(MODEL_FILE, "rb") as f:
+        return pickle.load(f)
+
+def load_model_and_encoders():
+    if not os.path.exists(MODEL_FILE) or not os.path.exists(ENCODER_FILE) or not os.path.exists(SLOT_ENCODER_FILE):
+        return None, None, None
+    le, slot_le = load_encoders()
+    return load_model(), le, slot_le
 
 if __name__ == "__main__":
     train_and_save_model()
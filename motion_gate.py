@@ -0,0 +1,88 @@
+# motion_gate.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides per frame whether the model has to run. The frame is compared
+    with the one the model last saw, at low resolution and only inside the
+    slot polygons: if no slot changed by more than `slot_threshold` of its
+    pixels, the previous occupancy is still valid and inference is skipped.
+    A full pass is forced at least every `refresh_interval` seconds so slow
+    changes (and tracker state) never go stale for long.
+    """
+
+    def __init__(self, geometry, scale=0.25, pixel_threshold=25, slot_threshold=0.02,
+                 refresh_interval=10.0):
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold      # grey level change that counts as motion
+        self.slot_threshold = slot_threshold        # fraction of a slot's pixels that must change
+        self.refresh_interval = refresh_interval    # seconds, None to never force a pass
+
+        self.frames = 0
+        self.skipped = 0
+        self.forced = 0
+        self._reference = None
+        self._last_inference = 0
+        self.set_geometry(geometry)
+
+    def set_geometry(self, geometry):
+        width, height = geometry.frame_size
+        self._size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        # slot label raster at gate resolution: 0 = outside every slot
+        self._labels = cv2.resize(geometry.label_map, self._size, interpolation=cv2.INTER_NEAREST)
+        self._roi = self._labels > 0
+        self._slot_pixels = np.maximum(np.bincount(self._labels.ravel(), minlength=geometry.slot_count + 1), 1)
+        self._reference = None
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_slots(self, gray):
+        """Fraction of changed pixels per slot index, against the reference frame."""
+        diff = cv2.absdiff(gray, self._reference)
+        moving = (diff > self.pixel_threshold) & self._roi
+        counts = np.bincount(self._labels[moving], minlength=len(self._slot_pixels))
+        return (counts / self._slot_pixels)[1:]
+
+    def check(self, frame):
+        """
+        Returns True when the model should run on this frame. The frame then
+        becomes the new reference, so the caller must run inference on it.
+        """
+        self.frames += 1
+        gray = self._prepare(frame)
+        now = time.monotonic()
+
+        if self._reference is None:
+            run = True
+        elif self.refresh_interval is not None and now - self._last_inference >= self.refresh_interval:
+            self.forced += 1
+            run = True
+        else:
+            run = bool(np.any(self.changed_slots(gray) > self.slot_threshold))
+
+        if run:
+            self._reference = gray
+            self._last_inference = now
+        else:
+            self.skipped += 1
+        return run
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skip_ratio, 3),
+            "forced_refreshes": self.forced,
+            "refresh_interval": self.refresh_interval,
+        }
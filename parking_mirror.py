@@ -0,0 +1,339 @@
+# parking_mirror.py
+# In-memory copy of the Realtime Database `parking/` tree for the API, so a
+# client poll of /parking is answered without a database read.
+#
+# mode="listen" keeps the copy current with one streaming listener: the
+# first event carries the whole tree, later ones only the paths the
+# detectors wrote. mode="poll" re-reads an area at most once per `ttl`
+# seconds, and concurrent requests for a stale area share that one read.
+# A listener that is slow to send its first snapshot is covered by polling
+# until the snapshot arrives, then the listener takes over again.
+#
+# Every area's JSON body and ETag are built once per change and reused by
+# all requests until the next one.
+#
+# stream() serves Server-Sent Events: a snapshot on connect, then only the
+# paths that changed ("slots/3/status": "free"), plus heartbeats. All
+# streams share the mirror's single upstream subscription; each change is
+# diffed and serialised once and handed to every subscriber.
+import hashlib
+import json
+import queue
+import threading
+import time
+
+
+class FirebaseSource:
+    """Reads and listens to `parking/` through firebase_admin."""
+
+    def get(self, area_name=None):
+        # firebase_client initialises the Firebase app on import, so only on first use
+        import firebase_client
+        return firebase_client.get_parking_data(area_name)
+
+    def listen(self, callback):
+        """Calls callback(event_type, path, data) per change; returns an object with close()."""
+        from firebase_admin import db
+        return db.reference("parking").listen(lambda event: callback(event.event_type, event.path, event.data))
+
+
+class InMemorySource:
+    """
+    Stand-in for `parking/`: emit() delivers an event to the listener the way
+    the Realtime Database stream does ('put' replaces the node at path,
+    'patch' updates children). Reads are counted in `reads`.
+    """
+
+    def __init__(self, tree=None):
+        self.tree = tree or {}
+        self.reads = 0
+        self._callback = None
+
+    def get(self, area_name=None):
+        self.reads += 1
+        return self.tree if area_name is None else self.tree.get(area_name)
+
+    def listen(self, callback):
+        self._callback = callback
+        callback("put", "/", self.tree)
+        return self
+
+    def emit(self, event_type, path, data):
+        if self._callback is not None:
+            self._callback(event_type, path, data)
+
+    def close(self):
+        self._callback = None
+
+
+def normalize_area(data):
+    """Firebase returns maps with numeric keys ("1", "2") as lists; the app expects a map."""
+    if isinstance(data, dict) and isinstance(data.get("slots"), list):
+        data = dict(data, slots={str(i): slot for i, slot in enumerate(data["slots"]) if slot is not None})
+    return data
+
+
+def _as_dict(node):
+    if isinstance(node, list):
+        return {str(i): value for i, value in enumerate(node) if value is not None}
+    return node if isinstance(node, dict) else {}
+
+
+def _set_path(tree, parts, value):
+    """Sets (or with None, deletes) the node at `parts` under `tree`; returns the new tree."""
+    if not parts:
+        return _as_dict(value) if value is not None else {}
+    tree = _as_dict(tree)
+    head, rest = parts[0], parts[1:]
+    if rest:
+        child = _set_path(tree.get(head), rest, value)
+        if child:
+            tree[head] = child
+        else:
+            tree.pop(head, None)
+    elif value is None:
+        tree.pop(head, None)
+    else:
+        tree[head] = value
+    return tree
+
+
+def flatten(node, prefix=""):
+    """{"slots": {"1": {"status": "free"}}} -> {"slots/1/status": "free"}"""
+    if isinstance(node, dict) and node:
+        flat = {}
+        for key, value in node.items():
+            flat.update(flatten(value, f"{prefix}{key}/"))
+        return flat
+    return {prefix[:-1]: node} if prefix else {}
+
+
+def diff_paths(old, new):
+    """Changes between two flatten()ed trees; removed paths map to None."""
+    changes = {path: value for path, value in new.items() if old.get(path, object()) != value}
+    changes.update({path: None for path in old.keys() - new.keys()})
+    return changes
+
+
+class Subscription:
+    """One stream's queue of SSE messages. A subscriber that falls behind is resynced with a snapshot."""
+
+    def __init__(self, area_name, max_pending=256):
+        self.area_name = area_name
+        self.queue = queue.Queue(max_pending)
+        self.overflowed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+
+class ParkingMirror:
+    def __init__(self, source=None, mode="listen", ttl=2.0, ready_timeout=5.0):
+        self.source = source or FirebaseSource()
+        self.mode = mode
+        self.ttl = ttl                      # poll mode: seconds an area is served before a re-read
+        self.ready_timeout = ready_timeout  # listen mode: wait this long for the first snapshot, then poll
+
+        self.tree = {}
+        self.events = 0
+        self.upstream_reads = 0
+        self.served = 0
+
+        self._bodies = {}                   # area (None = all) -> (etag, body bytes)
+        self._fetched_at = {}               # poll mode: area -> time of the last read
+        self._fetch_locks = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._listener = None
+        self._deadline = 0                  # listen mode: when requests stop waiting for the snapshot
+        self._fell_back = False
+
+    def start(self):
+        if self.mode != "listen":
+            return self
+        self._deadline = time.monotonic() + self.ready_timeout
+        try:
+            self._listener = self.source.listen(self._on_event)
+        except Exception as e:
+            print(f"Parking listener unavailable, polling every {self.ttl}s instead: {e}")
+            self.mode = "poll"
+        return self
+
+    @property
+    def ready(self):
+        """True once requests can be served without waiting on the first snapshot."""
+        return self.mode == "poll" or self._ready.is_set() or time.monotonic() >= self._deadline
+
+    def _polling(self):
+        """Poll mode, or listen mode still without its first snapshot."""
+        return self.mode == "poll" or not self._ready.is_set()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _on_event(self, event_type, path, data):
+        parts = [p for p in (path or "/").split("/") if p]
+        if event_type not in ("put", "patch"):
+            return
+        with self._lock:
+            area_name = parts[0] if parts else None
+            before = self._flat_areas(area_name)
+            if event_type == "put":
+                self.tree = _set_path(self.tree, parts, data)
+            else:
+                for key, value in (data or {}).items():
+                    self.tree = _set_path(self.tree, parts + [p for p in key.split("/") if p], value)
+            self.events += 1
+            self._invalidate(area_name)
+            self._publish(before, self._flat_areas(area_name))
+        if not self._ready.is_set():
+            self._ready.set()
+            if self._fell_back:
+                print("Parking listener delivered its snapshot, no longer polling")
+
+    def _flat_areas(self, area_name):
+        """flatten()ed areas (one, or all for None) to diff against, only while someone is streaming."""
+        if not self._subscribers:
+            return None
+        names = list(self.tree) if area_name is None else [area_name]
+        return {name: flatten(normalize_area(self.tree.get(name))) for name in names}
+
+    def _publish(self, before, after):
+        """Sends each area's changed paths to its subscribers, serialised once per change."""
+        if before is None or after is None:
+            return
+        for area_name in before.keys() | after.keys():
+            changes = diff_paths(before.get(area_name, {}), after.get(area_name, {}))
+            if not changes:
+                continue
+            message = "event: delta\ndata: " + json.dumps({"area": area_name, "changes": changes}) + "\n\n"
+            for subscription in list(self._subscribers):
+                if subscription.area_name in (None, area_name):
+                    subscription.push(message)
+
+    def _invalidate(self, area_name):
+        """Drops cached bodies of `area_name` (None = every area) and of the whole tree."""
+        if area_name is None:
+            self._bodies.clear()
+        else:
+            self._bodies.pop(area_name, None)
+            self._bodies.pop(None, None)
+
+    def _refresh(self, area_name):
+        """Poll mode: re-reads a stale area, once for all the requests waiting on it."""
+        with self._lock:
+            lock = self._fetch_locks.setdefault(area_name, threading.Lock())
+        with lock:
+            if time.monotonic() - self._fetched_at.get(area_name, float("-inf")) < self.ttl:
+                return          # another request refreshed it while we waited
+            data = self.source.get(area_name)
+            self.upstream_reads += 1
+            with self._lock:
+                if not self._polling():
+                    return      # the listener's snapshot arrived meanwhile and is newer
+                before = self._flat_areas(area_name)
+                self.tree = _set_path(self.tree, [area_name] if area_name else [], data)
+                self._fetched_at[area_name] = time.monotonic()
+                self._invalidate(area_name)
+                self._publish(before, self._flat_areas(area_name))
+
+    def get(self, area_name=None):
+        """(etag, JSON body) of one area (None = all areas), or None if it does not exist."""
+        if self.mode == "listen" and not self._ready.is_set():
+            if not self._ready.wait(max(0, self._deadline - time.monotonic())) and not self._fell_back:
+                self._fell_back = True
+                print("Parking listener has not delivered a snapshot yet, polling until it does")
+        if self._polling() and time.monotonic() - self._fetched_at.get(area_name, float("-inf")) >= self.ttl:
+            try:
+                self._refresh(area_name)
+            except Exception as e:
+                if area_name not in self._bodies:
+                    raise
+                print(f"Serving cached {area_name or 'parking'}, refresh failed: {e}")
+
+        with self._lock:
+            self.served += 1
+            return self._body(area_name)
+
+    def _body(self, area_name):
+        cached = self._bodies.get(area_name)
+        if cached is not None:
+            return cached
+        if area_name is None:
+            data = {name: normalize_area(area) for name, area in self.tree.items()}
+        else:
+            data = self.tree.get(area_name)
+            if data is None:
+                return None
+            data = normalize_area(data)
+        body = json.dumps(data, sort_keys=True).encode()
+        cached = self._bodies[area_name] = (hashlib.sha1(body).hexdigest()[:20], body)
+        return cached
+
+    def subscribe(self, area_name=None, max_pending=256):
+        """A new Subscription and the snapshot message it starts from, taken together."""
+        try:
+            self.get(area_name)         # poll mode: bring the area up to date first
+        except Exception as e:
+            print(f"Parking stream refresh failed: {e}")
+        subscription = Subscription(area_name, max_pending)
+        with self._lock:
+            # under the lock, so every later change lands in the queue and none is in the snapshot twice
+            self._subscribers.add(subscription)
+            return subscription, self._snapshot(area_name)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def _snapshot(self, area_name):
+        entry = self._body(area_name)
+        etag, body = entry if entry is not None else ("", b"null")
+        return f"event: snapshot\nid: {etag}\ndata: {body.decode()}\n\n"
+
+    def stream(self, area_name=None, heartbeat=15.0):
+        """
+        Server-Sent Events for one area (None = all): a snapshot, then a
+        delta per change, and a comment line every `heartbeat` seconds so
+        proxies keep the connection open.
+        """
+        subscription, snapshot = self.subscribe(area_name)
+        try:
+            yield snapshot
+            last_sent = time.monotonic()
+            while True:
+                # in poll mode the stream drives the (shared, single-flight) refresh
+                wait = min(heartbeat, self.ttl) if self._polling() else heartbeat
+                try:
+                    message = subscription.queue.get(timeout=wait)
+                except queue.Empty:
+                    message = None
+                if subscription.overflowed:
+                    # too slow to keep up: start over from a fresh snapshot
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    with self._lock:
+                        message = self._snapshot(area_name)
+                elif message is None and self._polling():
+                    try:
+                        self.get(area_name)
+                    except Exception as e:
+                        print(f"Parking stream refresh failed: {e}")
+                    message = subscription.queue.get_nowait() if not subscription.queue.empty() else None
+                if message is None and time.monotonic() - last_sent < heartbeat:
+                    continue
+                yield message if message is not None else ": heartbeat\n\n"
+                last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
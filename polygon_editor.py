@@ -0,0 +1,102 @@
+# polygon_editor.py
+# Interactive tool for drawing the slot polygons a ParkingAreaDetector reads.
+# Usage: python polygon_editor.py polygons1.json 11.mp4
+#   left click  - add a corner, every 4 corners become one slot polygon
+#   r           - remove the last polygon
+#   space       - pause / resume the video
+#   esc         - quit (polygons are saved after every change)
+import cv2
+import json
+import os
+import sys
+import numpy as np
+
+from slot_geometry import FRAME_SIZE
+
+
+class PolygonEditor:
+    def __init__(self, polygon_file, video_source, window_name="polygon editor"):
+        self.polygon_file = polygon_file
+        self.window_name = window_name
+        self.cap = cv2.VideoCapture(video_source)
+        self.polygons = []
+        self.polygon_points = []
+        self.paused = False
+
+        self._load_polygons()
+
+        cv2.namedWindow(self.window_name)
+        cv2.setMouseCallback(self.window_name, self._mouse_callback)
+
+    def _load_polygons(self):
+        if os.path.exists(self.polygon_file):
+            try:
+                with open(self.polygon_file, 'r') as f:
+                    self.polygons = json.load(f)
+            except:
+                self.polygons = []
+
+    def _save_polygons(self):
+        # write and rename, so a running detector never reads half a file
+        tmp = self.polygon_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.polygons, f)
+        os.replace(tmp, self.polygon_file)
+
+    def _mouse_callback(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.polygon_points.append((x, y))
+            if len(self.polygon_points) == 4:
+                self.polygons.append(self.polygon_points.copy())
+                self._save_polygons()
+                self.polygon_points.clear()
+
+    def _draw(self, frame):
+        for idx, poly in enumerate(self.polygons):
+            pts = np.array(poly, np.int32)
+            cv2.polylines(frame, [pts.reshape((-1, 1, 2))], isClosed=True, color=(0, 255, 0), thickness=2)
+            cx = int(pts[:, 0].mean())
+            cy = int(pts[:, 1].mean())
+            cv2.putText(frame, f"S{idx + 1}", (cx - 10, cy),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
+
+        # draw in-progress polygon points
+        for pt in self.polygon_points:
+            cv2.circle(frame, pt, 5, (0, 0, 255), -1)
+
+    def run(self):
+        frame = None
+        while True:
+            if not self.paused or frame is None:
+                ret, raw = self.cap.read()
+                if not ret:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                raw = cv2.resize(raw, FRAME_SIZE)
+
+            frame = raw.copy()
+            self._draw(frame)
+            cv2.imshow(self.window_name, frame)
+            key = cv2.waitKey(30) & 0xFF
+
+            if key == 27:
+                break
+            elif key == 32:
+                self.paused = not self.paused
+            elif key == ord('r') and self.polygons:
+                self.polygons.pop()
+                self._save_polygons()
+
+        self.cap.release()
+        cv2.destroyWindow(self.window_name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python polygon_editor.py <polygon_file> <video_source>")
+        sys.exit(1)
+
+    source = sys.argv[2]
+    if source.isdigit():
+        source = int(source)
+    PolygonEditor(sys.argv[1], source).run()
@@ -0,0 +1,216 @@
+# prediction_cache.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from stage_timer import NullTimer
+
+
+class FirestoreBackend:
+    """Reads and batch-writes the 'predictions' collection through firestore_client."""
+
+    def get(self, area_name, timestamp_str):
+        # firestore_client opens a Firestore client on import; wait until one is needed
+        import firestore_client
+        return firestore_client.get_prediction_from_firestore(area_name, timestamp_str)
+
+    def commit(self, predictions):
+        import firestore_client
+        firestore_client.save_predictions_to_firestore(predictions)
+
+
+class InMemoryBackend:
+    """
+    Stand-in for the Firestore 'predictions' collection. Every commit is
+    recorded in `commits`, every read in `reads`.
+    """
+
+    def __init__(self, fail_times=0):
+        self.docs = {}
+        self.commits = []
+        self.reads = 0
+        self.fail_times = fail_times    # make the next N commits raise, to exercise retries
+        self._lock = threading.Lock()
+
+    def get(self, area_name, timestamp_str):
+        with self._lock:
+            self.reads += 1
+            doc = self.docs.get(f"{area_name}_{timestamp_str}")
+            return copy.deepcopy(doc)
+
+    def commit(self, predictions):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("simulated backend failure")
+            self.commits.append(list(predictions))
+            for area_name, timestamp_str, free_slots in predictions:
+                self.docs[f"{area_name}_{timestamp_str}"] = {
+                    "area_name": area_name,
+                    "prediction_time": timestamp_str,
+                    "free_slots": list(free_slots),
+                }
+
+
+class PredictionCache(threading.Thread):
+    """
+    In-process tier in front of the Firestore prediction store.
+
+    get() answers from a local LRU of at most max_entries predictions, each
+    kept for ttl seconds. A local miss returns None straight away; only with
+    read_through=True does it first try a (blocking) backend read, which
+    pays off when predicting is slower than a Firestore round trip.
+    put() stores locally and queues the write; the cache thread commits the
+    queue in batches of up to batch_size, at most once per flush_interval,
+    so requests never wait on a Firestore write. Failed commits are retried
+    with exponential backoff.
+    """
+
+    def __init__(self, backend=None, ttl=3600.0, max_entries=10000, batch_size=500,
+                 flush_interval=1.0, read_through=False, retry_base=1.0, retry_max=30.0, timer=None):
+        super().__init__(name="prediction-cache", daemon=True)
+        self.backend = backend or FirestoreBackend()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.read_through = read_through    # read the backend (on the caller's thread) on a local miss
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.timer = timer or NullTimer()
+
+        self.hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.written = 0
+        self.commits = 0
+        self.failures = 0
+
+        self._entries = OrderedDict()      # (area, timestamp) -> (expires_at, free_slots)
+        self._pending = OrderedDict()      # (area, timestamp) -> free_slots, not yet committed
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+
+    def _remember(self, key, free_slots):
+        self._entries[key] = (time.monotonic() + self.ttl, free_slots)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, area_name, timestamp_str):
+        """Cached free slot list, or None."""
+        key = (area_name, timestamp_str)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        if self.read_through:
+            start = time.perf_counter()
+            try:
+                doc = self.backend.get(area_name, timestamp_str)
+            except Exception as e:
+                print(f"Prediction cache read for {area_name} at {timestamp_str} failed: {e}")
+                doc = None
+            self.timer.record("prediction_cache_read", time.perf_counter() - start)
+            if doc is not None:
+                free_slots = doc.get("free_slots", [])
+                with self._lock:
+                    self._remember(key, free_slots)
+                    self.remote_hits += 1
+                return free_slots
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, area_name, timestamp_str, free_slots):
+        """Caches a prediction and queues it for the backend. Never blocks on the network."""
+        key = (area_name, timestamp_str)
+        free_slots = list(free_slots)
+        with self._cond:
+            self._remember(key, free_slots)
+            self._pending[key] = free_slots
+            self._pending.move_to_end(key)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def run(self):
+        backoff = 0
+        while not self._stopped.is_set():
+            if backoff and self._stopped.wait(backoff):
+                break
+            with self._cond:
+                # a full batch goes out at once, a partial one after flush_interval
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._stopped.is_set(),
+                                    timeout=self.flush_interval)
+            if self._stopped.is_set():
+                break
+            backoff = 0 if self._commit() else min(self.retry_max, backoff * 2 if backoff else self.retry_base)
+
+        self.flush()
+
+    def _commit(self):
+        with self._lock:
+            keys = list(self._pending)[:self.batch_size]
+            batch = [(area, ts, self._pending.pop((area, ts))) for area, ts in keys]
+        return self._write(batch) if batch else True
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            self.backend.commit(batch)
+        except Exception as e:
+            self.failures += 1
+            print(f"Prediction cache commit of {len(batch)} failed ({self.failures} so far): {e}")
+            self._requeue(batch)
+            return False
+
+        self.timer.record("prediction_cache_commit", time.perf_counter() - start)
+        self.written += len(batch)
+        self.commits += 1
+        return True
+
+    def _requeue(self, predictions):
+        with self._lock:
+            # put them back unless a newer prediction replaced one meanwhile
+            for area, ts, free_slots in predictions:
+                self._pending.setdefault((area, ts), free_slots)
+
+    def flush(self):
+        """Commits everything queued right now."""
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+        queued = [(area, ts, free_slots) for (area, ts), free_slots in pending.items()]
+        for i in range(0, len(queued), self.batch_size):
+            if not self._write(queued[i:i + self.batch_size]):
+                self._requeue(queued[i + self.batch_size:])
+                return False
+        return True
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+        else:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "remote_hits": self.remote_hits,
+                "misses": self.misses,
+                "written": self.written,
+                "commits": self.commits,
+                "failures": self.failures,
+            }
@@ -0,0 +1,108 @@
+# prediction_table.py
+# The occupancy model only sees (hour, day, weekday, slot), so every answer it
+# can give fits in a 24 x 31 x 7 x slots table. The table is built with one
+# batched model.predict when the model loads, saved as .npy next to the model
+# and memory-mapped on the next start; /predict then just indexes it.
+#
+# The file name carries a hash of the model and encoder files, so retraining
+# (new pickles) builds a fresh table instead of reusing a stale one.
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from model_utils import MODEL_FILE, ENCODER_FILE, SLOT_ENCODER_FILE
+from slot_registry import FEATURES
+
+FREE_LABELS = ("unoccupied", "free", "0")
+
+
+def free_classes(classes):
+    """free[code] is True when status code `code` means the slot is free."""
+    return np.array([str(c).lower() in FREE_LABELS for c in classes])
+
+
+def model_key(paths=(MODEL_FILE, ENCODER_FILE, SLOT_ENCODER_FILE)):
+    identity = []
+    for path in paths:
+        stat = os.stat(path)
+        identity.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps(identity).encode()).hexdigest()[:16]
+
+
+class PredictionTable:
+    """
+    labels[hour, day - 1, weekday, slot_id_encoded] is the model's predicted
+    status code; free[code] says whether that status counts as a free slot.
+    """
+
+    def __init__(self, labels, classes):
+        self.labels = labels
+        self.classes = [str(c) for c in classes]
+        self.free = free_classes(self.classes)
+
+    @classmethod
+    def build(cls, model, le, slot_le):
+        import pandas as pd
+        slots = len(slot_le.classes_)
+        hour, day, weekday, slot = np.meshgrid(np.arange(24), np.arange(1, 32), np.arange(7),
+                                               np.arange(slots), indexing="ij")
+        grid = pd.DataFrame({
+            "hour": hour.ravel(),
+            "day": day.ravel(),
+            "weekday": weekday.ravel(),
+            "slot_id_encoded": slot.ravel(),
+        }, columns=FEATURES)
+        labels = np.asarray(model.predict(grid)).astype(np.uint8).reshape(24, 31, 7, slots)
+        return cls(labels, le.classes_)
+
+    @classmethod
+    def path(cls, cache_dir="."):
+        return os.path.join(cache_dir, f"prediction_table-{model_key()}.npy")
+
+    @classmethod
+    def load(cls, le, slot_le, cache_dir="."):
+        """Memory-maps the saved table of the current model files, or returns None. Needs no model."""
+        path = cls.path(cache_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            labels = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable prediction table {path}: {e}")
+            return None
+        if labels.shape != (24, 31, 7, len(slot_le.classes_)):
+            return None
+        print(f"Loaded prediction table {path}")
+        return cls(labels, le.classes_)
+
+    @classmethod
+    def load_or_build(cls, model, le, slot_le, cache_dir="."):
+        """Memory-maps the table for the current model files, building and saving it if missing."""
+        table = cls.load(le, slot_le, cache_dir)
+        if table is not None:
+            return table
+
+        print("Building prediction table...")
+        path = cls.path(cache_dir)
+        table = cls.build(model, le, slot_le)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, table.labels)
+        os.replace(tmp, path)
+        print(f"Saved prediction table {path} ({table.labels.nbytes // 1024} KiB)")
+        return cls(np.load(path, mmap_mode="r"), le.classes_)
+
+    def lookup(self, dt, encoded):
+        """Predicted status codes of the `encoded` slots at datetime `dt`."""
+        return self.labels[dt.hour, dt.day - 1, dt.weekday()][encoded]
+
+    def free_mask(self, dt, encoded):
+        return self.free[self.lookup(dt, encoded)]
+
+    def free_matrix(self, times, encoded):
+        """free[t, s] for every datetime in `times` and every `encoded` slot, in one index."""
+        hour = np.array([t.hour for t in times], np.int64)
+        day = np.array([t.day - 1 for t in times], np.int64)
+        weekday = np.array([t.weekday() for t in times], np.int64)
+        return self.free[self.labels[hour[:, None], day[:, None], weekday[:, None], encoded[None, :]]]
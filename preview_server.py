@@ -0,0 +1,136 @@
+# preview_server.py
+# Annotated camera preview over HTTP, for headless detectors. The detector
+# only draws overlays while someone is watching (viewers > 0) and hands the
+# frame over by reference; JPEG encoding happens on the viewers' threads,
+# at most max_fps per client and once per frame however many are watching.
+#
+#   http://<host>:<port>/            MJPEG stream (open in a browser / VLC)
+#   http://<host>:<port>/snapshot.jpg  single frame
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+class PreviewServer(threading.Thread):
+    def __init__(self, area_name, port, host="127.0.0.1", max_fps=5.0, quality=70):
+        super().__init__(name=f"preview-{area_name}", daemon=True)
+        self.area_name = area_name
+        self.max_fps = max_fps
+        self.quality = quality
+        self.viewers = 0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._jpeg = None           # (seq, bytes) of the last encoded frame
+        self._encode_lock = threading.Lock()
+        self._stopped = False
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path in ("/", "/stream.mjpg"):
+                    server._stream(self)
+                elif self.path == "/snapshot.jpg":
+                    server._snapshot(self)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def watched(self):
+        return self.viewers > 0
+
+    def submit(self, frame):
+        """Called by the detector with an annotated frame; never encodes."""
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _next_jpeg(self, after_seq, timeout):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq or self._stopped, timeout):
+                return after_seq, None
+            if self._stopped:
+                return after_seq, None
+            seq, frame = self._seq, self._frame
+
+        with self._encode_lock:
+            if self._jpeg is None or self._jpeg[0] != seq:
+                ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    return seq, None
+                self._jpeg = (seq, encoded.tobytes())
+            return seq, self._jpeg[1]
+
+    def _stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+
+        interval = 1.0 / self.max_fps if self.max_fps else 0
+        with self._cond:
+            self.viewers += 1
+        seq = 0
+        try:
+            while not self._stopped:
+                started = time.perf_counter()
+                seq, jpeg = self._next_jpeg(seq, timeout=5.0)
+                if jpeg is None:
+                    continue
+                handler.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                # per-client cap: frames in between are never encoded for it
+                remaining = interval - (time.perf_counter() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+    def _snapshot(self, handler):
+        # a snapshot counts as a viewer until the next drawn frame arrives;
+        # the last submitted frame may be from whoever watched before
+        with self._cond:
+            self.viewers += 1
+            seq = self._seq
+        try:
+            _, jpeg = self._next_jpeg(seq, timeout=5.0)
+        finally:
+            with self._cond:
+                self.viewers -= 1
+        if jpeg is None:
+            handler.send_error(503, "no frame yet")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def run(self):
+        print(f"{self.area_name} preview on http://{self.httpd.server_address[0]}:{self.httpd.server_address[1]}/")
+        self.httpd.serve_forever()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,184 @@
+# publisher.py
+import copy
+import threading
+import time
+
+from stage_timer import NullTimer
+
+
+class FirebaseBackend:
+    """Writes to the Realtime Database through firebase_client."""
+
+    def update(self, area_name, updates):
+        # firebase_client initialises the app from credentials on import; only do that
+        # once something is actually written (InMemoryBackend never needs it)
+        import firebase_client
+        firebase_client.update_parking_paths(area_name, updates)
+
+
+class InMemoryBackend:
+    """
+    Stand-in for the Realtime Database with the same multi-path update
+    semantics: keys are '/'-separated paths under parking/<area_name> and a
+    None value deletes the node. Every call is recorded in `calls`.
+    """
+
+    def __init__(self, fail_times=0):
+        self.data = {}
+        self.calls = []
+        self.fail_times = fail_times    # make the next N calls raise, to exercise retries
+        self._lock = threading.Lock()
+
+    def update(self, area_name, updates):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("simulated backend failure")
+            updates = copy.deepcopy(updates)
+            self.calls.append((area_name, copy.deepcopy(updates)))
+            area = self.data.setdefault(area_name, {})
+            for path, value in updates.items():
+                *parents, leaf = path.split("/")
+                node = area
+                for key in parents:
+                    node = node.setdefault(key, {})
+                if value is None:
+                    node.pop(leaf, None)
+                else:
+                    node[leaf] = value
+
+    def get(self, area_name):
+        with self._lock:
+            return self.data.get(area_name)
+
+
+def diff_slot_status(previous, current):
+    """Multi-path updates that turn `previous` slot_status into `current`."""
+    updates = {}
+    for slot_id, status in current.items():
+        if previous.get(slot_id) != status:
+            updates[f"slots/{slot_id}/status"] = status
+    for slot_id in previous.keys() - current.keys():
+        updates[f"slots/{slot_id}"] = None
+    return updates
+
+
+class ParkingPublisher(threading.Thread):
+    """
+    Publishes one area's slot status off the detector loop.
+
+    publish() only records the latest state and returns immediately. The
+    publisher thread sends at most one write per min_interval, so bursts are
+    coalesced, and only sends the slots that changed since the last
+    successful write (the first write sends the whole area). Failed writes
+    are retried with exponential backoff; since the diff is always taken
+    against the last state that reached the backend, nothing is lost.
+    """
+
+    def __init__(self, area_name, backend=None, min_interval=2.0, keepalive=60.0,
+                 retry_base=1.0, retry_max=30.0, timer=None):
+        super().__init__(name=f"publisher-{area_name}", daemon=True)
+        self.area_name = area_name
+        self.backend = backend or FirebaseBackend()
+        self.min_interval = min_interval    # seconds between writes
+        self.keepalive = keepalive          # refresh updated_at at least this often
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.timer = timer or NullTimer()
+
+        self.published = None               # last slot_status that reached the backend
+        self.last_write_time = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_latency = None            # seconds taken by the last successful write
+
+        self._pending = None
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+    def publish(self, slot_status):
+        """Queues the latest slot status. Never blocks on the network."""
+        with self._cond:
+            self._pending = dict(slot_status)
+            self._cond.notify()
+
+    def build_updates(self, slot_status):
+        if self.published is None:
+            updates = {
+                "area_name": self.area_name,
+                "slots": {str(slot_id): {"status": status} for slot_id, status in slot_status.items()},
+            }
+        else:
+            updates = diff_slot_status(self.published, slot_status)
+            if not updates and time.time() - self.last_write_time < self.keepalive:
+                return {}
+
+        occupied = sum(1 for status in slot_status.values() if status == "occupied")
+        updates.update({
+            "total_slots": len(slot_status),
+            "free_slots": len(slot_status) - occupied,
+            "occupied_slots": occupied,
+            "updated_at": int(time.time())  # unix timestamp
+        })
+        return updates
+
+    def run(self):
+        backoff = 0
+        while not self._stopped.is_set():
+            # coalesce: wait out the rest of min_interval (or the retry backoff)
+            wait = max(backoff, self.last_write_time + self.min_interval - time.time())
+            if wait > 0 and self._stopped.wait(wait):
+                break
+
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopped.is_set(),
+                                    timeout=self.keepalive)
+                slot_status = self._pending if self._pending is not None else self.published
+                self._pending = None
+            if slot_status is None:
+                continue
+
+            if self._send(slot_status):
+                backoff = 0
+            else:
+                with self._cond:
+                    # keep the failed state unless something newer arrived
+                    if self._pending is None:
+                        self._pending = slot_status
+                backoff = min(self.retry_max, backoff * 2 if backoff else self.retry_base)
+
+        self.flush()
+
+    def _send(self, slot_status):
+        updates = self.build_updates(slot_status)
+        if not updates:
+            return True
+
+        start = time.perf_counter()
+        try:
+            self.backend.update(self.area_name, updates)
+        except Exception as e:
+            self.failures += 1
+            print(f"Publish for {self.area_name} failed ({self.failures} so far): {e}")
+            return False
+
+        self.last_latency = time.perf_counter() - start
+        self.timer.record("publish_write", self.last_latency)
+        self.published = slot_status
+        self.last_write_time = time.time()
+        self.writes += 1
+        return True
+
+    def flush(self):
+        """Sends whatever is pending right now, once."""
+        with self._cond:
+            slot_status, self._pending = self._pending, None
+        if slot_status is not None:
+            self._send(slot_status)
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout)
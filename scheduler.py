@@ -0,0 +1,137 @@
+# scheduler.py
+# Splits one CPU / inference budget over all cameras. Every camera publishes
+# what a refresh costs it and how busy its slots are into a small table in
+# shared memory; from the whole table each camera works out how often it may
+# refresh. Busy entrances get frequent refreshes, quiet lots slow down, and
+# nobody goes longer than max_interval without one.
+#
+# A camera's weight is priority x churn (slot changes per second, with a small
+# floor), raised further the longer it has gone without a refresh.
+#
+# The budget is in cores: 2.0 means the detectors may keep two cores busy
+# between them. Cameras that cannot use their share (they already refresh at
+# min_interval) hand the rest to the others.
+import time
+
+import numpy as np
+
+# per-camera fields of the shared table
+PRIORITY, COST, CHURN, LAST_REFRESH, TARGET, ACHIEVED, REFRESHES = range(7)
+FIELDS = 7
+
+
+def allocate(costs, weights, budget, min_interval, max_interval):
+    """
+    Refresh interval per camera: everyone gets one refresh per max_interval,
+    what is left of `budget` goes out in proportion to `weights`, and rates
+    above 1 / min_interval are capped with the excess handed on.
+    """
+    costs = np.maximum(np.asarray(costs, float), 1e-4)
+    weights = np.maximum(np.asarray(weights, float), 1e-9)
+    rates = np.full(len(costs), 1.0 / max_interval)
+    remaining = budget - (costs * rates).sum()
+    active = np.ones(len(costs), bool)
+
+    while remaining > 1e-9 and active.any():
+        extra = remaining * weights / weights[active].sum()
+        proposed = np.where(active, rates + extra / costs, rates)
+        capped = active & (proposed >= 1.0 / min_interval)
+        if not capped.any():
+            rates = proposed
+            break
+        remaining -= ((1.0 / min_interval - rates[capped]) * costs[capped]).sum()
+        rates[capped] = 1.0 / min_interval
+        active &= ~capped
+    return 1.0 / rates
+
+
+class BudgetTable:
+    """
+    Shared per-camera stats. Created by the supervisor and passed to the
+    workers; `array` comes from the supervisor's multiprocessing context.
+    """
+
+    def __init__(self, areas, priorities, array, budget=1.0, min_interval=0.2, max_interval=10.0,
+                 churn_floor=0.01):
+        self.areas = list(areas)
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.churn_floor = churn_floor      # slot changes / s that even an idle lot counts as
+        self.array = array
+        self._attach()
+        self.rows[:, PRIORITY] = priorities
+        self.rows[:, COST] = 0.1            # seconds per refresh, until measured
+        self.rows[:, TARGET] = min_interval
+
+    @classmethod
+    def create(cls, ctx, cameras, budget=1.0, min_interval=0.2, max_interval=10.0):
+        array = ctx.RawArray("d", len(cameras) * FIELDS)
+        return cls([c["area"] for c in cameras], [c.get("priority", 1.0) for c in cameras], array,
+                   budget, min_interval, max_interval)
+
+    def _attach(self):
+        self.rows = np.frombuffer(self.array, np.float64).reshape(len(self.areas), FIELDS)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["rows"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def schedule(self, area_name):
+        return CameraSchedule(self, self.areas.index(area_name))
+
+    def intervals(self):
+        rows = self.rows
+        staleness = np.where(rows[:, REFRESHES] > 0, time.time() - rows[:, LAST_REFRESH], 0)
+        weights = (rows[:, PRIORITY] * (rows[:, CHURN] + self.churn_floor)
+                   * (1 + np.clip(staleness / self.max_interval, 0, 1)))
+        return allocate(rows[:, COST], weights, self.budget, self.min_interval, self.max_interval)
+
+    def report(self):
+        rows = self.rows
+        return {
+            area: {
+                "priority": round(float(row[PRIORITY]), 2),
+                "cost_ms": round(float(row[COST]) * 1000, 1),
+                "churn_per_min": round(float(row[CHURN]) * 60, 2),
+                "target_interval_s": round(float(row[TARGET]), 2),
+                "achieved_interval_s": round(float(row[ACHIEVED]), 2) if row[REFRESHES] > 1 else None,
+                "refreshes": int(row[REFRESHES]),
+            }
+            for area, row in zip(self.areas, rows)
+        }
+
+
+class CameraSchedule:
+    """One camera's view of the BudgetTable: records refreshes, returns the next interval."""
+
+    def __init__(self, table, index, smoothing=0.2, churn_window=60.0):
+        self.table = table
+        self.index = index
+        self.smoothing = smoothing          # EWMA weight of a new cost / interval sample
+        self.churn_window = churn_window    # seconds the churn rate is averaged over
+
+    def interval(self):
+        target = float(self.table.intervals()[self.index])
+        self.table.rows[self.index, TARGET] = target
+        return target
+
+    def record(self, cost, changed_slots, now=None):
+        now = time.time() if now is None else now
+        row = self.table.rows[self.index]
+        a = self.smoothing
+        row[COST] = cost if row[REFRESHES] == 0 else (1 - a) * row[COST] + a * cost
+
+        if row[REFRESHES] > 0:
+            elapsed = max(now - row[LAST_REFRESH], 1e-3)
+            row[ACHIEVED] = elapsed if row[REFRESHES] == 1 else (1 - a) * row[ACHIEVED] + a * elapsed
+            # time-weighted average of slot changes per second
+            decay = np.exp(-elapsed / self.churn_window)
+            row[CHURN] = decay * row[CHURN] + (1 - decay) * changed_slots / elapsed
+        row[LAST_REFRESH] = now
+        row[REFRESHES] += 1
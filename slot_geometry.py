@@ -0,0 +1,185 @@
+# slot_geometry.py
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+FRAME_SIZE = (1020, 500)    # working resolution (width, height) the polygons are drawn in
+
+
+class SlotGeometry:
+    """
+    Slot polygons compiled once into the structures the detector needs every
+    frame: int32 contours for drawing, centroids for labels, bounding boxes and
+    a label raster where each pixel holds slot index + 1 (0 = no slot).
+
+    Mapping detections to slots is then a single array index instead of one
+    cv2.pointPolygonTest per polygon per detection.
+    """
+
+    def __init__(self, polygons, frame_size=FRAME_SIZE):
+        self.polygons = polygons
+        self.frame_size = frame_size
+        self.slot_count = len(polygons)
+
+        self.contours = [np.array(poly, np.int32).reshape((-1, 1, 2)) for poly in polygons]
+        points = [np.array(poly, np.int32).reshape((-1, 2)) for poly in polygons]
+        if points:
+            self.centroids = np.array([pts.mean(axis=0) for pts in points]).astype(int)
+            self.bboxes = np.array([np.concatenate([pts.min(axis=0), pts.max(axis=0)])
+                                    for pts in points])
+        else:
+            self.centroids = np.zeros((0, 2), int)
+            self.bboxes = np.zeros((0, 4), int)
+
+        self.label_map = self._rasterize()
+
+    def _rasterize(self):
+        width, height = self.frame_size
+        label_map = np.zeros((height, width), np.uint16)
+        # paint in reverse so that where slots overlap the first polygon wins,
+        # like the old first-match pointPolygonTest loop
+        for idx in range(self.slot_count - 1, -1, -1):
+            cv2.fillPoly(label_map, [self.contours[idx]], idx + 1)
+        return label_map
+
+    def lookup(self, points):
+        """Maps an (N, 2) array of x, y points to slot indexes, -1 where no slot."""
+        points = np.asarray(points, np.intp).reshape((-1, 2))
+        x, y = points[:, 0], points[:, 1]
+        width, height = self.frame_size
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+
+        labels = np.zeros(len(points), np.intp)
+        labels[inside] = self.label_map[y[inside], x[inside]]
+        return labels - 1
+
+    def crop_regions(self, padding=40, max_regions=4):
+        """
+        Rectangles (x1, y1, x2, y2) that together cover every slot plus
+        `padding` pixels, so inference can skip the rest of the frame.
+        Overlapping slot boxes are merged; if the layout still needs more than
+        max_regions crops, a single box around all slots is returned instead.
+        """
+        if not self.slot_count:
+            return []
+
+        width, height = self.frame_size
+        regions = [[max(0, x1 - padding), max(0, y1 - padding),
+                    min(width, x2 + padding), min(height, y2 + padding)]
+                   for x1, y1, x2, y2 in self.bboxes.tolist()]
+
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in regions:
+                for other in result:
+                    if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                        other[:] = [min(box[0], other[0]), min(box[1], other[1]),
+                                    max(box[2], other[2]), max(box[3], other[3])]
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            regions = result
+
+        if len(regions) > max_regions:
+            boxes = np.array(regions)
+            regions = [[boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()]]
+        return sorted(tuple(int(v) for v in box) for box in regions)
+
+
+def load_polygons(path, frame_size=FRAME_SIZE):
+    """
+    Reads and checks a polygon file: a list of polygons of at least three
+    [x, y] points inside the working frame. Raises ValueError otherwise.
+    """
+    with open(path, "r") as f:
+        try:
+            polygons = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not valid JSON: {e}")
+
+    if not isinstance(polygons, list):
+        raise ValueError(f"{path} must hold a list of polygons")
+    width, height = frame_size
+    for idx, poly in enumerate(polygons):
+        try:
+            points = np.array(poly, float)
+        except (TypeError, ValueError):
+            raise ValueError(f"slot {idx + 1} in {path} is not a list of points")
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError(f"slot {idx + 1} in {path} needs at least 3 [x, y] points")
+        if (points < 0).any() or (points[:, 0] > width).any() or (points[:, 1] > height).any():
+            raise ValueError(f"slot {idx + 1} in {path} lies outside the {width}x{height} frame")
+    return polygons
+
+
+class PolygonWatcher(threading.Thread):
+    """
+    Polls a polygon file's mtime and, when it changes, validates it and
+    compiles a new SlotGeometry on this thread. The detector picks it up with
+    take() between frames, so the swap is a single reference assignment. A
+    malformed file is reported and the old geometry stays in use.
+    """
+
+    def __init__(self, path, frame_size=FRAME_SIZE, interval=1.0):
+        super().__init__(name=f"polygons-{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.frame_size = frame_size
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self._pending = None
+        self._pending_lock = threading.Lock()   # check() and take() run on different threads
+        self._seen = self._signature()
+        self._stopped = threading.Event()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def run(self):
+        changed = None
+        while not self._stopped.wait(self.interval):
+            signature = self._signature()
+            if signature is None or signature == self._seen:
+                changed = None
+                continue
+            if signature != changed:
+                # wait one more poll so a file still being written settles
+                changed = signature
+                continue
+            self._seen = signature
+            changed = None
+            self.check()
+
+    def check(self):
+        """Loads and compiles the file now; returns True if a new geometry is pending."""
+        try:
+            polygons = load_polygons(self.path, self.frame_size)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"Keeping the current slots, {e}")
+            return False
+        geometry = SlotGeometry(polygons, self.frame_size)
+        with self._pending_lock:
+            self._pending = geometry
+        self.reloads += 1
+        print(f"Reloaded {self.path}: {len(polygons)} slots")
+        return True
+
+    def take(self):
+        """The newly compiled geometry, once, or None."""
+        with self._pending_lock:
+            geometry, self._pending = self._pending, None
+        return geometry
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,86 @@
+# slot_registry.py
+# Maps every area's local slot ids ("1", "2", ...) to the model's encoded slot
+# ids once, at startup, so predictions for an area (or all of them) are built
+# from NumPy arrays instead of one slot_le.transform call per slot.
+#
+# The model was trained on slots "1".."60": area1's slots are "1".."23" and
+# area2's continue at "24". Each area's `model_slot_offset` in
+# parking_config.json says where its slots start; without one an area
+# continues after the slots of the areas listed before it.
+from collections import namedtuple
+
+import numpy as np
+
+FEATURES = ["hour", "day", "weekday", "slot_id_encoded"]
+
+# slot_ids: local ids the model knows, encoded: their model slot indices
+AreaSlots = namedtuple("AreaSlots", ["slot_ids", "encoded", "unknown"])
+
+
+def encode_slots(model_slot_ids, slot_classes):
+    """Vectorised slot_le.transform: index into slot_classes per id, -1 if unknown."""
+    classes = np.asarray(slot_classes).astype(str)
+    ids = np.asarray(model_slot_ids).astype(str)
+    if not len(classes):
+        return np.full(len(ids), -1, np.int64)
+    order = np.argsort(classes)
+    found = order[np.searchsorted(classes, ids, sorter=order).clip(max=len(classes) - 1)]
+    return np.where(classes[found] == ids, found, -1)
+
+
+class SlotRegistry:
+    def __init__(self, config, slot_classes):
+        self.areas = {}
+        local, model_ids, owners = [], [], []
+        next_offset = 0
+        for area_name, area_data in config.items():
+            if not isinstance(area_data, dict):
+                continue
+            slots = list(area_data.get("slots", {}).keys())
+            offset = area_data.get("model_slot_offset", next_offset)
+            ids = np.array(slots, dtype=str)
+            numeric = np.char.isdigit(ids)
+            shifted = ids.astype(object)        # shifted ids may be longer than the local ones
+            if numeric.any():
+                shifted[numeric] = (ids[numeric].astype(np.int64) + offset).astype(str)
+            local.append(ids)
+            model_ids.append(shifted)
+            owners.append(area_name)
+            next_offset = offset + len(slots)
+
+        # one encoding pass over every slot of every area
+        all_ids = np.concatenate(model_ids) if model_ids else np.zeros(0, str)
+        encoded = encode_slots(all_ids, slot_classes)
+        start = 0
+        for area_name, ids in zip(owners, local):
+            codes = encoded[start:start + len(ids)]
+            known = codes >= 0
+            self.areas[area_name] = AreaSlots(ids[known].tolist(), codes[known], ids[~known].tolist())
+            start += len(ids)
+
+    def __contains__(self, area_name):
+        return area_name in self.areas
+
+    def area(self, area_name):
+        return self.areas.get(area_name)
+
+    def features(self, area_names, times):
+        """
+        One feature row per (time, area slot), times outermost. Returns the
+        DataFrame plus the row count per area for splitting the predictions.
+        """
+        import pandas as pd         # only the model path needs it; table lookups do not
+        encoded = [self.areas[name].encoded for name in area_names]
+        counts = [len(e) for e in encoded]
+        slots = np.concatenate(encoded) if encoded else np.zeros(0, np.int64)
+        times = list(times)
+        hour = np.array([t.hour for t in times], np.int64)
+        day = np.array([t.day for t in times], np.int64)
+        weekday = np.array([t.weekday() for t in times], np.int64)
+        frame = pd.DataFrame({
+            "hour": np.repeat(hour, len(slots)),
+            "day": np.repeat(day, len(slots)),
+            "weekday": np.repeat(weekday, len(slots)),
+            "slot_id_encoded": np.tile(slots, len(times)),
+        }, columns=FEATURES)
+        return frame, counts
@@ -0,0 +1,57 @@
+# stage_timer.py
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class NullTimer:
+    """Default timer of the pipeline: records nothing."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def record(self, name, seconds):
+        pass
+
+    def frame_done(self):
+        pass
+
+
+class StageTimer(NullTimer):
+    """
+    Keeps every duration per pipeline stage (decode, resize, inference,
+    match, draw, publish, ...). Meant for benchmarks and short runs, since
+    samples are never discarded.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        # list.append is atomic, so the grabber and publisher threads can record too
+        self.samples[name].append(seconds)
+
+    def summary(self):
+        result = {}
+        for name, samples in list(self.samples.items()):
+            ms = np.array(samples) * 1000
+            result[name] = {
+                "count": len(ms),
+                "total_ms": round(float(ms.sum()), 3),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return result
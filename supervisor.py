@@ -0,0 +1,316 @@
+# supervisor.py
+# Runs every camera listed in a manifest (cameras.json) on a pool of worker
+# processes sized to the machine, restarts workers that die and shuts
+# everything down cleanly on Ctrl+C / SIGTERM. Adding a camera is a manifest
+# change:
+#
+#   {
+#     "model": "best.pt",              defaults for every camera ...
+#     "headless": true,
+#     "budget": {"cores": 2.0, "min_interval": 0.2, "max_interval": 10},
+#     "cameras": [
+#       {"area": "area1", "source": "11.mp4", "polygons": "polygons1.json", "priority": 2},
+#       ...
+#     ]
+#   }
+#
+# With a "budget" the cameras share that many cores between them (see
+# scheduler.py) instead of each running at its own target_fps.
+import json
+import multiprocessing as mp
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+# per-camera settings and their defaults; anything not given on a camera is
+# taken from the top level of the manifest, then from here
+CAMERA_DEFAULTS = {
+    "model": "best.pt",
+    "backend": "auto",
+    "capture": "opencv",            # or "pyav": threaded decode straight to the working size
+    "headless": True,
+    "target_fps": None,
+    "motion_gate": False,
+    "refresh_interval": 10.0,
+    "roi_crop": False,
+    "keyframe_interval": None,      # run the model every N frames, track in between
+    "preview_fps": 5.0,
+    "priority": 1.0,                # share of the budget relative to the other cameras
+    "detection_cache": None,        # directory; cache detections of looped video files
+    "watch_polygons": True,         # pick up edits to the polygon file while running
+}
+
+MANIFEST_DEFAULTS = {
+    "workers": None,                # None = one per available core (at most one per camera)
+    "threads_per_worker": 1,        # OpenMP / OpenCV / torch threads in each worker
+    "pin_cpus": False,              # pin each worker to its own core (Linux)
+    "shared_model": False,          # one batched InferenceServer instead of a model per worker
+    "metrics_port_base": None,      # camera i serves metrics on base + i
+    "preview_port_base": None,      # camera i serves its MJPEG preview on base + i
+    "restart_backoff_max": 60.0,
+    "budget": None,                 # {"cores", "min_interval", "max_interval"}: adaptive refresh rates
+    "report_interval": 60.0,        # seconds between refresh-interval reports (with a budget)
+}
+
+
+def load_manifest(path):
+    with open(path, "r") as f:
+        raw = json.load(f)
+
+    manifest = {key: raw.get(key, default) for key, default in MANIFEST_DEFAULTS.items()}
+    cameras = []
+    for index, entry in enumerate(raw.get("cameras", [])):
+        if "area" not in entry or "source" not in entry or "polygons" not in entry:
+            raise ValueError(f"camera #{index} in {path} needs 'area', 'source' and 'polygons'")
+        camera = {key: entry.get(key, raw.get(key, default)) for key, default in CAMERA_DEFAULTS.items()}
+        camera.update(area=entry["area"], source=entry["source"], polygons=entry["polygons"])
+        if manifest["metrics_port_base"] is not None:
+            camera["metrics_port"] = manifest["metrics_port_base"] + index
+        if manifest["preview_port_base"] is not None:
+            camera["preview_port"] = manifest["preview_port_base"] + index
+        cameras.append(camera)
+
+    areas = [camera["area"] for camera in cameras]
+    if len(set(areas)) != len(areas):
+        raise ValueError(f"duplicate area names in {path}")
+    manifest["cameras"] = cameras
+    return manifest
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def limit_threads(threads):
+    """Call before heavy imports in a worker so BLAS / OpenMP pools stay small."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+
+def worker_main(worker_id, cameras, threads, cpu, clients, budget=None):
+    limit_threads(threads)
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    import cv2
+    cv2.setNumThreads(threads)
+    from detector import ParkingAreaDetector
+
+    detectors = []
+    for camera in cameras:
+        source = camera["source"]
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        detectors.append(ParkingAreaDetector(
+            area_name=camera["area"],
+            video_source=source,
+            polygon_file=camera["polygons"],
+            model_path=camera["model"],
+            backend=camera["backend"],
+            capture=camera["capture"],
+            headless=camera["headless"],
+            target_fps=camera["target_fps"],
+            inference=clients.get(camera["area"]),
+            motion_gate=camera["motion_gate"],
+            refresh_interval=camera["refresh_interval"],
+            roi_crop=camera["roi_crop"],
+            keyframe_interval=camera["keyframe_interval"],
+            metrics_port=camera.get("metrics_port"),
+            preview_port=camera.get("preview_port"),
+            preview_fps=camera["preview_fps"],
+            detection_cache=camera["detection_cache"],
+            schedule=budget.schedule(camera["area"]) if budget is not None else None,
+            watch_polygons=camera["watch_polygons"],
+        ))
+
+    # only if the backend pulled torch in; ONNX / OpenVINO workers never load it
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopping.set()
+        for d in detectors:
+            d.stop()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    # a window can only be driven from the main thread
+    if len(detectors) == 1:
+        detectors[0].run()
+        return
+
+    failed = []
+
+    def run_camera(detector):
+        try:
+            detector.run()
+        except Exception:
+            traceback.print_exc()
+            failed.append(detector.area_name)
+            stopping.set()
+
+    runners = [threading.Thread(target=run_camera, args=(d,), name=d.area_name, daemon=True)
+               for d in detectors]
+    for runner in runners:
+        runner.start()
+    while not stopping.is_set() and any(runner.is_alive() for runner in runners):
+        stopping.wait(0.5)
+
+    for d in detectors:
+        d.stop()
+    for runner in runners:
+        runner.join(timeout=10)
+
+    # a crashed camera takes the worker down with a non-zero code so the
+    # supervisor restarts it with all its cameras
+    if failed:
+        print(f"Worker {worker_id}: cameras {', '.join(failed)} crashed")
+        raise SystemExit(1)
+
+
+class Supervisor:
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.cameras = manifest["cameras"]
+        self.ctx = mp.get_context("spawn")   # fresh interpreters: thread limits apply before imports
+        self.server = None
+        self.clients = {}
+        self.budget = None
+        self._last_report = time.time()
+        self.workers = {}       # worker_id -> dict(process, cameras, restarts, started, next_start)
+        self._stopping = threading.Event()
+
+    def plan(self):
+        """Splits the cameras round-robin over the worker processes."""
+        cameras = self.cameras
+        if not all(camera["headless"] for camera in cameras):
+            # windowed cameras each need their own process main thread
+            count = len(cameras)
+        else:
+            cores = available_cores()
+            count = self.manifest["workers"] or max(1, cores // max(1, self.manifest["threads_per_worker"]))
+            count = min(count, len(cameras))
+        return [cameras[i::count] for i in range(count)]
+
+    def _spawn(self, worker_id):
+        worker = self.workers[worker_id]
+        cpu = None
+        if self.manifest["pin_cpus"] and hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+            cpu = cores[worker_id % len(cores)]
+        clients = {c["area"]: self.clients[c["area"]] for c in worker["cameras"] if c["area"] in self.clients}
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, worker["cameras"], self.manifest["threads_per_worker"], cpu, clients, self.budget),
+            name=f"worker-{worker_id}",
+        )
+        process.start()
+        worker.update(process=process, started=time.time(), next_start=None, finished=False)
+        areas = ", ".join(c["area"] for c in worker["cameras"])
+        print(f"Started worker {worker_id} (pid {process.pid}) for {areas}")
+
+    def start(self):
+        if self.manifest["shared_model"]:
+            # the server runs one model for every camera
+            models = sorted({(camera["model"], camera["backend"]) for camera in self.cameras})
+            if len(models) > 1:
+                raise ValueError(f"shared_model needs every camera on the same model and backend, got {models}")
+
+        budget = self.manifest["budget"]
+        if budget:
+            from scheduler import BudgetTable
+            self.budget = BudgetTable.create(self.ctx, self.cameras, budget.get("cores", 1.0),
+                                             budget.get("min_interval", 0.2), budget.get("max_interval", 10.0))
+
+        if self.manifest["shared_model"]:
+            from inference_server import InferenceServer
+            self.server = InferenceServer(model_path=self.cameras[0]["model"], backend=self.cameras[0]["backend"],
+                                          ctx=self.ctx)
+            self.clients = {camera["area"]: self.server.client(camera["area"]) for camera in self.cameras}
+            self.server.start()
+
+        for worker_id, cameras in enumerate(self.plan()):
+            self.workers[worker_id] = {"cameras": cameras, "restarts": 0, "process": None}
+            self._spawn(worker_id)
+
+    def report(self):
+        print("Refresh intervals: " + json.dumps(self.budget.report()))
+
+    def check(self):
+        """Restarts crashed workers (non-zero exit) with exponential backoff."""
+        now = time.time()
+        if self.budget is not None and now - self._last_report >= self.manifest["report_interval"]:
+            self.report()
+            self._last_report = now
+        if self.server is not None and not self.server.is_alive():
+            print("Inference server died, restarting it")
+            self.server.restart()
+
+        for worker_id, worker in self.workers.items():
+            process = worker["process"]
+            if worker.get("next_start"):
+                if now >= worker["next_start"]:
+                    self._spawn(worker_id)
+                continue
+            if process.is_alive():
+                continue
+            if process.exitcode == 0:
+                # finished on purpose (window closed, source ended)
+                if not worker.get("finished"):
+                    print(f"Worker {worker_id} finished")
+                    worker["finished"] = True
+                continue
+
+            # a worker that ran for a while before dying starts over with a short delay
+            if now - worker["started"] > self.manifest["restart_backoff_max"]:
+                worker["restarts"] = 0
+            delay = min(self.manifest["restart_backoff_max"], 2 ** worker["restarts"])
+            worker["restarts"] += 1
+            worker["next_start"] = now + delay
+            print(f"Worker {worker_id} exited with code {process.exitcode}, restarting in {delay:.0f}s")
+
+    def stop(self, timeout=15):
+        self._stopping.set()
+        processes = [w["process"] for w in self.workers.values() if w["process"] is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()     # SIGTERM: detectors stop and flush their publishers
+        deadline = time.time() + timeout
+        for process in processes:
+            process.join(max(0, deadline - time.time()))
+            if process.is_alive():
+                process.kill()
+        if self.server is not None:
+            self.server.stop()
+
+    def run(self):
+        def handle_signal(signum, frame):
+            self._stopping.set()
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                self.check()
+        finally:
+            print("Shutting down workers...")
+            self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run all cameras from a manifest")
+    parser.add_argument("manifest", nargs="?", default="cameras.json")
+    args = parser.parse_args()
+    Supervisor(load_manifest(args.manifest)).run()
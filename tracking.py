@@ -0,0 +1,97 @@
+# tracking.py
+import cv2
+import numpy as np
+
+
+class KeyframeTracker:
+    """
+    Carries the boxes of the last model run (the keyframe) forward with
+    sparse Lucas-Kanade optical flow, so the model only has to run every
+    `interval` frames. A handful of points inside each box are followed at
+    `scale` resolution; each box moves by the median shift of its points.
+
+    A box's confidence is scaled by the share of its points that tracked
+    well (forward-backward check), so it drops as a vehicle gets occluded or
+    leaves. A new keyframe is requested when `interval` frames have passed,
+    when any box lost track, or when the mean carried confidence falls
+    below `min_confidence`.
+    """
+
+    def __init__(self, interval=5, min_confidence=0.35, scale=0.5, grid=3, max_error=1.0):
+        self.interval = max(1, interval)
+        self.min_confidence = min_confidence
+        self.scale = scale
+        self.grid = grid                # grid x grid points per box
+        self.max_error = max_error      # forward-backward error in pixels (at `scale`)
+
+        self.keyframes = 0
+        self.tracked = 0
+        self._detections = None
+        self._gray = None
+        self._since_keyframe = 0
+        self._lost = False
+        self._lk = dict(winSize=(11, 11), maxLevel=2,
+                        criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def _prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def needs_keyframe(self):
+        if self._detections is None or self._lost or self._since_keyframe >= self.interval:
+            return True
+        conf = self._detections.conf
+        return len(conf) > 0 and float(conf.mean()) < self.min_confidence
+
+    def keyframe(self, frame, detections):
+        """Starts tracking from fresh model output on `frame`."""
+        self._detections = detections
+        self._gray = self._prepare(frame)
+        self._since_keyframe = 0
+        self._lost = False
+        self.keyframes += 1
+
+    def _box_points(self, xyxy):
+        # points on an inner grid (10%..90%) of every box, at tracking scale
+        steps = np.linspace(0.1, 0.9, self.grid, dtype=np.float32)
+        fx, fy = np.meshgrid(steps, steps)
+        fx, fy = fx.ravel(), fy.ravel()
+        boxes = xyxy * self.scale
+        x = boxes[:, 0:1] + (boxes[:, 2:3] - boxes[:, 0:1]) * fx
+        y = boxes[:, 1:2] + (boxes[:, 3:4] - boxes[:, 1:2]) * fy
+        return np.stack([x, y], axis=2).reshape(-1, 1, 2).astype(np.float32)
+
+    def track(self, frame):
+        """Moves the keyframe boxes onto `frame` and returns them as Detections."""
+        detections = self._detections
+        gray = self._prepare(frame)
+        self._since_keyframe += 1
+        self.tracked += 1
+        if not len(detections.xyxy):
+            self._gray = gray
+            return detections
+
+        points = self._box_points(detections.xyxy)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, **self._lk)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, moved, None, **self._lk)
+        error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.max_error)
+
+        per_box = self.grid * self.grid
+        good = good.reshape(-1, per_box)
+        shift = (moved - points).reshape(-1, per_box, 2)
+        # median over the points that tracked; boxes with none stay put
+        median = np.zeros((len(good), 2), np.float32)
+        alive = good.any(axis=1)
+        if alive.any():
+            shift = np.where(good[alive, :, None], shift[alive], np.nan)
+            median[alive] = np.nanmedian(shift, axis=1) / self.scale
+        quality = good.mean(axis=1).astype(np.float32)
+
+        xyxy = detections.xyxy + np.hstack([median, median]).astype(np.float32)
+        self._detections = detections._replace(xyxy=xyxy, conf=detections.conf * quality)
+        self._lost = bool((quality < 0.5).any())
+        self._gray = gray
+        return self._detections
@@ -1,8 +1,10 @@
 import json
 from datetime import datetime
-import pandas as pd
+import numpy as np
 from model_utils import load_model_and_encoders
-from firestore_client import save_prediction_to_firestore
+from prediction_table import free_classes
+from slot_registry import SlotRegistry
+from firestore_client import save_predictions_to_firestore
 
 def update_all_predictions():
     print("Loading config...")
@@ -21,50 +23,28 @@ def update_all_predictions():
 
     timestamp_str = datetime.now().isoformat()
     dt = datetime.fromisoformat(timestamp_str)
-    
-    # Pre-calculate time features
-    hour = dt.hour
-    day = dt.day
-    weekday = dt.weekday()
 
-    for area_name, area_data in config.items():
+    # One feature matrix and one model call for every slot of every area
+    registry = SlotRegistry(config, slot_le.classes_)
+    areas = list(registry.areas)
+    input_df, counts = registry.features(areas, [dt])
+    free = free_classes(le.classes_)[np.asarray(model.predict(input_df))]
+
+    predictions = []
+    start = 0
+    for area_name, count in zip(areas, counts):
         print(f"Processing {area_name}...")
-        slots = area_data.get("slots", {})
-        
-        free_slots = []
-        
-        for slot_id in slots.keys():
-            # Prepare input
-            try:
-                # Map local ID ("1", "2") to model ID ("1", "24")
-                # Area 1: 1 -> "1", Area 2: 1 -> "24"
-                model_slot_id = slot_id
-                if area_name == "area2":
-                    model_slot_id = str(int(slot_id) + 23)
+        area_slots = registry.area(area_name)
+        for slot_id in area_slots.unknown:
+            print(f"Slot {slot_id} not known to model.")
+        free_slots = [s for s, f in zip(area_slots.slot_ids, free[start:start + count]) if f]
+        start += count
 
-                encoded_slot = slot_le.transform([model_slot_id])[0]
-                
-                input_df = pd.DataFrame([{
-                    "hour": hour,
-                    "day": day,
-                    "weekday": weekday,
-                    "slot_id_encoded": encoded_slot
-                }])
-                
-                pred = model.predict(input_df)
-                label = le.inverse_transform(pred)[0]
-                
-               
-                if str(label).lower() in ["unoccupied", "free", "0"]:
-                    free_slots.append(slot_id)
-                    
-            except ValueError:
-                print(f"Slot {slot_id} not known to model.")
-                continue
-                
-        # Save to Firestore
         print(f"Area {area_name}: {len(free_slots)} free slots found.")
-        save_prediction_to_firestore(area_name, timestamp_str, free_slots)
+        predictions.append((area_name, timestamp_str, free_slots))
+
+    # Save to Firestore, every area in one batched write
+    save_predictions_to_firestore(predictions)
 
 if __name__ == "__main__":
     update_all_predictions()
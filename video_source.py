@@ -0,0 +1,130 @@
+# video_source.py
+# PyAV (FFmpeg) capture with the parts of the cv2.VideoCapture interface that
+# FrameGrabber uses: grab / retrieve / read / get / set / isOpened / release.
+#
+# Compared with cv2.VideoCapture it
+#   - decodes with FFmpeg's frame/slice threads,
+#   - converts to BGR and scales in one swscale pass, straight to the working
+#     resolution, so a 4K frame is never materialised as a full-size BGR image
+#     (the codec itself still decodes at source resolution), and
+#   - with skip_nonref, tells the decoder to drop non-reference (B) frames,
+#     which cost decode time but are never needed when subsampling.
+#
+#   cap = PyAvCapture("rtsp://...", size=(1020, 500), skip_nonref=True)
+import cv2
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class PyAvCapture:
+    def __init__(self, source, size=None, threads=0, skip_nonref=False, options=None):
+        if av is None:
+            raise ImportError("PyAV is not installed: pip install av")
+        self.source = source
+        self.size = size                    # (width, height) of returned frames, None = source size
+        self.threads = threads              # 0 = let FFmpeg pick
+        self.skip_nonref = skip_nonref
+        self.options = options or {}
+        if isinstance(source, str) and source.startswith("rtsp://"):
+            self.options.setdefault("rtsp_transport", "tcp")
+
+        self.container = None
+        self.stream = None
+        self.frame_index = -1               # index of the last grabbed frame, from its timestamp
+        self._frames = None
+        self._frame = None
+        self._open()
+
+    def _open(self):
+        try:
+            self.container = av.open(self.source, options=self.options)
+        except (av.FFmpegError, OSError) as e:
+            print(f"Cannot open {self.source}: {e}")
+            self.container = None
+            return
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"            # frame + slice threads
+        self.stream.thread_count = self.threads
+        if self.skip_nonref:
+            self.stream.codec_context.skip_frame = "NONREF"
+        self._frames = self.container.decode(self.stream)
+        self._fps = self.get(cv2.CAP_PROP_FPS)
+        self._start = self.stream.start_time or 0
+
+    def isOpened(self):
+        return self.container is not None
+
+    def grab(self):
+        """Decodes the next frame, without converting it to BGR."""
+        if self._frames is None:
+            return False
+        try:
+            self._frame = frame = next(self._frames)
+        except (StopIteration, av.FFmpegError, OSError):
+            self._frame = None
+            return False
+        # skipped frames leave gaps, so count from the timestamp
+        if frame.pts is not None and self._fps:
+            self.frame_index = round(float((frame.pts - self._start) * self.stream.time_base) * self._fps)
+        else:
+            self.frame_index += 1
+        return True
+
+    def retrieve(self):
+        if self._frame is None:
+            return False, None
+        if self.size:
+            width, height = self.size
+            image = self._frame.to_ndarray(width=width, height=height, format="bgr24",
+                                           interpolation="AREA")
+        else:
+            image = self._frame.to_ndarray(format="bgr24")
+        return True, image
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if self.stream is None:
+            return 0.0
+        if prop == cv2.CAP_PROP_FPS:
+            rate = self.stream.average_rate or self.stream.guessed_rate
+            return float(rate) if rate else 0.0
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.stream.frames)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0] if self.size else self.stream.codec_context.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1] if self.size else self.stream.codec_context.height)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and value == 0 and self.container is not None:
+            # only rewinding is needed (looping simulation files)
+            self.container.seek(0, stream=self.stream)
+            self._frames = self.container.decode(self.stream)
+            self.frame_index = -1
+            return True
+        return False
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+        self.container = None
+        self.stream = None
+        self._frames = None
+        self._frame = None
+
+
+def open_capture(source, backend="opencv", size=None, skip_nonref=False):
+    """cv2.VideoCapture, or PyAvCapture for backend="pyav"."""
+    if backend == "pyav":
+        return PyAvCapture(source, size=size, skip_nonref=skip_nonref)
+    if backend == "opencv":
+        return cv2.VideoCapture(source)
+    raise ValueError(f"Unknown capture backend: {backend}")